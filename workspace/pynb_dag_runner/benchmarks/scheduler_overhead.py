@@ -0,0 +1,308 @@
+"""
+Benchmark for the scheduling overhead of pynb_dag_runner.
+
+All tasks are no-op Python tasks (see task_from_python_function), so the measured
+times are orchestration overhead only. The benchmark covers the DAG shapes:
+
+ - chain: N tasks run in sequence (run_in_sequence)
+
+      t0 ---> t1 ---> ... ---> t(N-1)
+
+ - fan_in: W parallel tasks with one target task (fan_in)
+
+      t0, t1, ..., t(W-1) ---> target
+
+ - diamond: one source task, W parallel tasks, and one sink task (run_dag)
+
+      source ---> t0, t1, ..., t(W-1) ---> sink
+
+ - random: random DAG with N tasks where each pair of tasks is connected with
+   probability p (run_dag)
+
+For every run, the following is reported:
+
+ - wall_s: time from starting the DAG until all tasks have completed;
+ - wall_s_per_task: wall_s divided by the number of tasks (amortized overhead per
+   task);
+ - dispatch_latency_s: for every task, the time from when its last upstream task
+   finished (or from when the DAG was started, for tasks without upstream tasks) to
+   when the task started. Reported as median, 90th percentile and max;
+ - memory_bytes_per_task: growth of resident memory of the driver and Ray worker
+   processes during the run, divided by the number of tasks.
+
+Results are written as JSON (with git commit and library versions) so that runs
+on different commits can be compared. Eg.
+
+    python3 benchmarks/scheduler_overhead.py --output /tmp/benchmark.json
+
+The benchmark starts a local Ray cluster, and spans are logged (and parsed) as
+in the unit tests. One warm-up run is done before any measurements, so that Ray
+worker processes and pooled ExecActor:s (see ray_helpers.py) are started.
+"""
+
+import datetime, os, platform, random, statistics, subprocess, sys, time
+from argparse import ArgumentParser
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+#
+import psutil, ray
+
+#
+from pynb_dag_runner.core.dag_runner import (
+    RemoteTaskP,
+    fan_in,
+    run_dag,
+    run_in_sequence,
+    start_and_await_tasks,
+    task_from_python_function,
+)
+from pynb_dag_runner.helpers import write_json
+from pynb_dag_runner.opentelemetry_helpers import (
+    SpanRecorder,
+    Spans,
+    iso8601_to_epoch_s,
+)
+
+Edges = List[Tuple[int, int]]
+
+
+def _noop(_: Any) -> None:
+    return None
+
+
+def make_tasks(nr_tasks: int) -> List[RemoteTaskP]:
+    return [
+        task_from_python_function(_noop, attributes={"task.benchmark_node": k})
+        for k in range(nr_tasks)
+    ]
+
+
+# --- DAG shapes: each returns (number of tasks, edges, function to run DAG) ---
+
+
+def chain(length: int):
+    assert length >= 2
+
+    def run(tasks: List[RemoteTaskP]):
+        run_in_sequence(*tasks)
+        start_and_await_tasks(tasks[:1], tasks[-1:], timeout_s=600)
+
+    return length, [(k, k + 1) for k in range(length - 1)], run
+
+
+def fan_in_dag(width: int):
+    assert width >= 1
+
+    def run(tasks: List[RemoteTaskP]):
+        fan_in(tasks[:-1], tasks[-1])
+        start_and_await_tasks(tasks[:-1], tasks[-1:], timeout_s=600)
+
+    return width + 1, [(k, width) for k in range(width)], run
+
+
+def _run_dag_with_edges(edges: Edges) -> Callable[[List[RemoteTaskP]], None]:
+    def run(tasks: List[RemoteTaskP]):
+        run_dag(
+            tasks,
+            edges=[(tasks[k1], tasks[k2]) for k1, k2 in edges],
+            timeout_s=600,
+        )
+
+    return run
+
+
+def diamond(width: int):
+    assert width >= 1
+    # source task 0, parallel tasks 1, ..., width, sink task width + 1
+    edges: Edges = [(0, k) for k in range(1, width + 1)] + [
+        (k, width + 1) for k in range(1, width + 1)
+    ]
+    return width + 2, edges, _run_dag_with_edges(edges)
+
+
+def random_dag(nr_tasks: int, edge_probability: float, seed: int):
+    # only add edges from lower to higher task numbers, so the graph has no cycles
+    rng = random.Random(seed)
+    edges: Edges = [
+        (k1, k2)
+        for k1 in range(nr_tasks)
+        for k2 in range(k1 + 1, nr_tasks)
+        if rng.random() < edge_probability
+    ]
+    return nr_tasks, edges, _run_dag_with_edges(edges)
+
+
+# --- measurements ---
+
+
+def _rss_bytes() -> int:
+    """
+    Return total resident memory of this (driver) process and all Ray worker
+    processes (ie. processes with title "ray::<task or actor name>").
+    """
+    result: int = psutil.Process().memory_info().rss
+
+    for process in psutil.process_iter(["cmdline", "memory_info"]):
+        cmdline: Optional[List[str]] = process.info["cmdline"]
+        if cmdline and cmdline[0].startswith("ray::") and process.info["memory_info"]:
+            result += process.info["memory_info"].rss
+
+    return result
+
+
+def _percentile(xs: List[float], p: float) -> float:
+    xs_sorted: List[float] = sorted(xs)
+    return xs_sorted[min(len(xs) - 1, int(p * len(xs)))]
+
+
+def _dispatch_latencies_s(
+    spans: Spans, nr_tasks: int, edges: Edges, dag_start_s: float
+) -> List[float]:
+    start_s: Dict[int, float] = {}
+    end_s: Dict[int, float] = {}
+    for span in spans.filter(["name"], "execute-task"):
+        node: int = span["attributes"]["task.benchmark_node"]
+        start_s[node] = iso8601_to_epoch_s(span["start_time"])
+        end_s[node] = iso8601_to_epoch_s(span["end_time"])
+    assert len(start_s) == nr_tasks
+
+    upstream: Dict[int, List[int]] = {k: [] for k in range(nr_tasks)}
+    for k1, k2 in edges:
+        upstream[k2].append(k1)
+
+    return [
+        start_s[k] - max([end_s[k_up] for k_up in upstream[k]], default=dag_start_s)
+        for k in range(nr_tasks)
+    ]
+
+
+def measure(nr_tasks: int, edges: Edges, run) -> Dict[str, Any]:
+    rss_before: int = _rss_bytes()
+
+    with SpanRecorder() as rec:
+        tasks: List[RemoteTaskP] = make_tasks(nr_tasks)
+
+        dag_start_s: float = time.time()
+        run(tasks)
+        wall_s: float = time.time() - dag_start_s
+
+    rss_after: int = _rss_bytes()
+    latencies_s: List[float] = _dispatch_latencies_s(
+        rec.spans, nr_tasks, edges, dag_start_s
+    )
+
+    return {
+        "nr_tasks": nr_tasks,
+        "nr_edges": len(edges),
+        "wall_s": wall_s,
+        "wall_s_per_task": wall_s / nr_tasks,
+        "dispatch_latency_s": {
+            "median": statistics.median(latencies_s),
+            "p90": _percentile(latencies_s, 0.9),
+            "max": max(latencies_s),
+        },
+        "memory_bytes_per_task": (rss_after - rss_before) / nr_tasks,
+    }
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            cwd=Path(__file__).parent,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _int_list(value: str) -> List[int]:
+    return [int(x) for x in value.split(",") if x != ""]
+
+
+def args():
+    parser = ArgumentParser(description="Benchmark scheduling overhead")
+    parser.add_argument("--output", type=Path, required=True, help="output JSON file")
+    parser.add_argument("--num_cpus", type=int, default=2)
+    parser.add_argument("--nr_repeats", type=int, default=3)
+    parser.add_argument("--chain_lengths", type=_int_list, default=[2, 10, 50])
+    parser.add_argument("--fan_in_widths", type=_int_list, default=[2, 10, 50])
+    parser.add_argument("--diamond_widths", type=_int_list, default=[2, 10, 50])
+    parser.add_argument("--random_dag_sizes", type=_int_list, default=[10, 50])
+    parser.add_argument("--random_dag_edge_probability", type=float, default=0.1)
+    parser.add_argument("--seed", type=int, default=0)
+    return parser.parse_args()
+
+
+def entry_point():
+    opts = args()
+
+    ray.init(
+        num_cpus=opts.num_cpus,
+        namespace="pydar-ray-cluster",
+        # log spans to /tmp/spans (as in unit tests), these are read by SpanRecorder
+        _tracing_startup_hook="ray.util.tracing.setup_local_tmp_tracing:setup_tracing",
+    )
+
+    benchmarks: List[Tuple[str, int, Any]] = (
+        [("chain", n, chain(n)) for n in opts.chain_lengths]
+        + [("fan_in", w, fan_in_dag(w)) for w in opts.fan_in_widths]
+        + [("diamond", w, diamond(w)) for w in opts.diamond_widths]
+        + [
+            (
+                "random",
+                n,
+                random_dag(n, opts.random_dag_edge_probability, opts.seed + n),
+            )
+            for n in opts.random_dag_sizes
+        ]
+    )
+
+    # warm-up (start Ray workers and pooled actors)
+    measure(*chain(2))
+
+    results: List[Dict[str, Any]] = []
+    for shape, size, (nr_tasks, edges, run) in benchmarks:
+        for repeat_nr in range(opts.nr_repeats):
+            result = {
+                "shape": shape,
+                "size": size,
+                "repeat_nr": repeat_nr,
+                **measure(nr_tasks, edges, run),
+            }
+            print(
+                f" - {shape:>8} size={size:<4} repeat={repeat_nr}:",
+                f"wall_s={result['wall_s']:.3f}",
+                f"wall_s_per_task={result['wall_s_per_task']:.4f}",
+                f"median dispatch_latency_s={result['dispatch_latency_s']['median']:.4f}",
+                f"memory_bytes_per_task={result['memory_bytes_per_task']:.0f}",
+            )
+            results.append(result)
+
+    ray.shutdown()
+
+    write_json(
+        opts.output,
+        {
+            "metadata": {
+                "git_commit": _git_commit(),
+                "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+                "python_version": sys.version,
+                "ray_version": ray.__version__,
+                "platform": platform.platform(),
+                "num_cpus": opts.num_cpus,
+                "cpu_count": os.cpu_count(),
+                "random_dag_edge_probability": opts.random_dag_edge_probability,
+                "seed": opts.seed,
+            },
+            "results": results,
+        },
+    )
+    print(" - Results written to", opts.output)
+
+
+if __name__ == "__main__":
+    entry_point()
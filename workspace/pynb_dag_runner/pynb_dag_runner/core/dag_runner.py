@@ -1,13 +1,22 @@
-import asyncio
-from dataclasses import dataclass
+import asyncio, concurrent.futures, dataclasses, heapq, itertools, sys, time, uuid
+from contextlib import contextmanager
+from dataclasses import dataclass, field
 from typing import (
+    Any,
+    AsyncIterator,
     Awaitable,
+    Dict,
     List,
+    Mapping,
     Optional,
+    Set,
+    Tuple,
     TypeVar,
     Generic,
     Callable,
+    Iterator,
     Protocol,
+    Sequence,
 )
 
 #
@@ -17,15 +26,35 @@ from opentelemetry.trace.span import Span
 from opentelemetry.trace import StatusCode, Status  # type: ignore
 
 #
-from pynb_dag_runner.helpers import pairs, Try
+from pynb_dag_runner.helpers import (
+    compose,
+    longest_path_weights,
+    pairs,
+    topological_sort,
+    Try,
+)
 from pynb_dag_runner.ray_helpers import try_f_with_timeout_guard
 from pynb_dag_runner.ray_helpers import (
     RayMypy,
+    ResourceEscalation,
+    RetryPolicy,
+    get_exec_actor_pool,
     try_f_with_timeout_guard,
     retry_wrapper_ot,
 )
+from pynb_dag_runner.local_executor import LocalExecutor, LocalRef
+from pynb_dag_runner.local_executor import get as local_get
 from pynb_dag_runner.ray_mypy_helpers import RemoteGetFunction, RemoteSetFunction
 from pynb_dag_runner.opentelemetry_helpers import SpanId, get_span_hexid, AttributesDict
+from pynb_dag_runner.core.task_cache import (
+    CachedResult,
+    TaskCache,
+    get_fingerprint,
+    get_function_source,
+    replay_cached_result,
+    run_with_cache,
+)
+from pynb_dag_runner.tasks.task_opentelemetry_logging import _record_logged_values
 
 
 # -- types --
@@ -45,15 +74,32 @@ class TaskOutcome(Generic[A]):
     error: Optional[BaseException]
 
 
+class TaskCancelledError(Exception):
+    """
+    Error of tasks cancelled by the failure policy of a DAG (see run_dag).
+    """
+
+
+FAILURE_POLICIES = ["continue", "skip-downstream", "fail-fast"]
+
+
 X = TypeVar("X", contravariant=True)
 Y = TypeVar("Y", covariant=True)
 
 
+TaskId = str
+
+
 class RemoteTaskP(Protocol[X, Y]):
     """
-    Protocol to encode methods by remote Ray GenTask_OT-Actor
+    Protocol to encode remote methods of a task. The task state (GenTask_OT) is held
+    by the DagScheduler_OT-Actor, and these methods are forwarded to that actor.
     """
 
+    @property
+    def task_id(self) -> TaskId:
+        ...
+
     @property
     def start(self) -> RemoteSetFunction[X]:
         ...
@@ -66,10 +112,18 @@ class RemoteTaskP(Protocol[X, Y]):
     def get_task_result(self) -> RemoteGetFunction[Y]:
         ...
 
+    @property
+    def get_task_result_without_value(self) -> RemoteGetFunction[Y]:
+        ...
+
     @property
     def get_span_id(self) -> RemoteGetFunction[str]:
         ...
 
+    @property
+    def get_attributes(self) -> RemoteGetFunction[AttributesDict]:
+        ...
+
     @property
     def has_started(self) -> RemoteGetFunction[bool]:
         ...
@@ -79,10 +133,13 @@ class RemoteTaskP(Protocol[X, Y]):
         ...
 
 
-@ray.remote(num_cpus=0)
-class GenTask_OT(Generic[U, A, B], RayMypy):
+class GenTask_OT(Generic[U, A, B]):
     """
-    Represent a task that a can be run once
+    Represent a task that a can be run once.
+
+    Notes:
+    - Instances are not Ray actors, but are created and held by the DagScheduler_OT
+      actor (see below). Thus, the constructor should run in the actor's event loop.
     """
 
     def __init__(
@@ -97,11 +154,14 @@ class GenTask_OT(Generic[U, A, B], RayMypy):
 
         self._f_remote: Callable[[U], Awaitable[A]] = f_remote
         self._combiner: Callable[[Span, Try[A]], B] = combiner
-        self._on_complete_callbacks: List[
-            Callable[[B], Awaitable[None]]
-        ] = on_complete_callbacks
+        # copy list since instances share the scheduler process (and default value)
+        self._on_complete_callbacks: List[Callable[[B], Awaitable[None]]] = list(
+            on_complete_callbacks
+        )
         self._attributes: AttributesDict = attributes
         self._start_called = False
+        self._cancelled = False
+        self._f_run: Optional[asyncio.Future[A]] = None
         self._future_span_id: asyncio.Future[SpanId] = create_future()
         self._future_result: asyncio.Future[B] = create_future()
 
@@ -115,6 +175,35 @@ class GenTask_OT(Generic[U, A, B], RayMypy):
 
         self._on_complete_callbacks.append(cb)
 
+    def set_attribute(self, key: str, value: Any) -> None:
+        """
+        Set attribute to be logged for this task.
+
+        Note:
+        - Method can only be called before first call to start-method.
+        """
+        if self.has_started():
+            raise Exception("Cannot set attributes once task has started")
+
+        self._attributes = {**self._attributes, key: value}
+
+    def reuse_result(self, cached_result: CachedResult) -> None:
+        """
+        Replace the task body with a replay of a result from a previous run (see
+        incremental_run.py).
+
+        Note:
+        - Method can only be called before first call to start-method.
+        """
+        if self.has_started():
+            raise Exception("Cannot reuse result once task has started")
+
+        async def replay_f_remote(_: U) -> A:
+            otel.trace.get_current_span().set_attribute("task.reused", True)
+            return replay_cached_result(cached_result)
+
+        self._f_remote = replay_f_remote
+
     def _set_result(self, value: B):
         self._future_result.set_result(value)  # type: ignore
 
@@ -143,12 +232,20 @@ class GenTask_OT(Generic[U, A, B], RayMypy):
                 for k, v in self._attributes.items():
                     span.set_attribute(k, v)
 
+                if self._cancelled:
+                    raise TaskCancelledError("Task cancelled before start")
+
                 # wait for task to finish
-                f_result: A = await self._f_remote(arg)
+                self._f_run = asyncio.ensure_future(self._f_remote(arg))
+                f_result: A = await self._f_run
 
                 # post-task
                 task_result = self._combiner(span, Try(f_result, None))
             except BaseException as e:
+                if self._cancelled:
+                    span.set_attribute("task.cancelled", True)
+                    if not isinstance(e, TaskCancelledError):
+                        e = TaskCancelledError("Task cancelled while running")
                 task_result = self._combiner(span, Try(None, e))
 
         # note that result is set before callbacks are called
@@ -156,6 +253,32 @@ class GenTask_OT(Generic[U, A, B], RayMypy):
 
         await asyncio.gather(*[cb(task_result) for cb in self._on_complete_callbacks])
 
+        # Callbacks reference downstream tasks (and their results). Drop these, so a
+        # completed task does not keep downstream tasks alive.
+        self._on_complete_callbacks = []
+
+    def cancel(self) -> None:
+        """
+        Cancel task:
+         - If the task has not started, the task body is not run when the task is
+           started. Instead the task completes immediately with a TaskCancelledError.
+         - If the task is running, the task body is interrupted, and the task
+           completes with a TaskCancelledError.
+         - If the task has completed, do nothing.
+
+        Cancelled tasks are logged with a task.cancelled attribute.
+
+        Note:
+        - Cancelled tasks still need to be started to complete (and to run their
+          on_complete callbacks).
+        """
+        if self.has_completed():
+            return
+
+        self._cancelled = True
+        if self._f_run is not None:
+            self._f_run.cancel()
+
     def has_started(self) -> bool:
         return self._start_called
 
@@ -178,6 +301,9 @@ class GenTask_OT(Generic[U, A, B], RayMypy):
         """
         return await self._future_span_id
 
+    def get_attributes(self) -> AttributesDict:
+        return self._attributes
+
     def has_completed(self) -> bool:
         """
         Returns True/False whether task has completed.
@@ -190,11 +316,725 @@ class GenTask_OT(Generic[U, A, B], RayMypy):
         return self._future_result.done()
 
 
+def _result_size_bytes(result: Any) -> int:
+    """
+    Approximate the memory held by a task result, as the size of the pickled result.
+
+    Return values kept in Ray's object store (see return_value_to_object_store in
+    task_from_python_function) are only counted as the size of their object refs.
+    """
+    try:
+        return len(ray.cloudpickle.dumps(result))
+    except Exception:
+        return sys.getsizeof(result)
+
+
+@ray.remote(num_cpus=0)
+def _run_task_body(f: Callable[[U], Awaitable[Try[B]]], arg: U) -> Try[B]:
+    """
+    Evaluate the body of a task as a plain Ray task (ie., not in an actor).
+    """
+    return asyncio.get_event_loop().run_until_complete(f(arg))
+
+
+@ray.remote(num_cpus=0, num_returns=2)
+def _run_task_body_to_object_store(
+    f: Callable[[U], Awaitable[Try[B]]], arg: U
+) -> Tuple[Try[None], Optional[B]]:
+    """
+    As _run_task_body, but return any return value of the task body as a separate
+    Ray object. The caller can then pass on the object ref without fetching the value.
+    """
+    try_b: Try[B] = asyncio.get_event_loop().run_until_complete(f(arg))
+    if try_b.is_success():
+        return Try(None, None), try_b.value
+    else:
+        return Try(None, try_b.error), None
+
+
+async def _await_task_body(ref: Any) -> Any:
+    """
+    Await the result of a task body Ray task (see above).
+
+    If the awaiting coroutine is cancelled (see GenTask_OT.cancel), the Ray task is
+    killed together with any ExecActor:s (see ray_helpers.py) leased by the task body.
+    """
+    try:
+        return await ref
+    except asyncio.CancelledError:
+        exec_actor_pool = get_exec_actor_pool()
+        await exec_actor_pool.terminate_leases.remote(ref.task_id().hex())
+        ray.cancel(ref, force=True)
+        raise
+
+
+def _resolve_return_values(arg: Any) -> Any:
+    """
+    Replace TaskOutcome return values stored in the Ray object store (see the
+    return_value_to_object_store option in task_from_python_function) with their
+    values. The input can be a TaskOutcome, a list of TaskOutcome:s (eg. for fan_in),
+    or any other value (returned as is).
+
+    Note: objects are read from the local object store, and for eg. numpy arrays
+    this does not copy data.
+    """
+    if isinstance(arg, list):
+        return [_resolve_return_values(a) for a in arg]
+
+    if isinstance(arg, TaskOutcome) and isinstance(
+        arg.return_value, ray._raylet.ObjectRef
+    ):
+        return dataclasses.replace(arg, return_value=ray.get(arg.return_value))
+
+    return arg
+
+
+class _PrioritySlots:
+    """
+    Asyncio semaphore with a limited number of slots, where waiting coroutines are
+    given slots in priority order (highest priority first). If nr_slots is None,
+    the number of slots is unlimited.
+    """
+
+    def __init__(self, nr_slots: Optional[int]):
+        self._nr_free_slots: Optional[int] = nr_slots
+        self._waiters: List[Tuple[float, int, asyncio.Future]] = []
+        self._counter = itertools.count()
+
+    async def acquire(self, priority: float) -> None:
+        if self._nr_free_slots is None:
+            return
+
+        if self._nr_free_slots > 0:
+            self._nr_free_slots -= 1
+            return
+
+        waiter: asyncio.Future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (-priority, next(self._counter), waiter))
+        await waiter
+
+    def release(self) -> None:
+        if self._nr_free_slots is None:
+            return
+
+        if len(self._waiters) > 0:
+            # hand over slot to waiter with highest priority
+            _, _, waiter = heapq.heappop(self._waiters)
+            waiter.set_result(None)
+        else:
+            self._nr_free_slots += 1
+
+
+class DagScheduler:
+    """
+    Holds the state of every task (as GenTask_OT instances) created by a driver, and
+    wires task dependencies.
+
+    Task dependencies are resolved inside the scheduler, so starting a downstream
+    task when its upstream task(s) have completed does not require any remote calls.
+
+    The scheduler is run either as a Ray actor (DagScheduler_OT below), or in the
+    event loop of a LocalExecutor (see local_executor below).
+
+    Notes:
+    - Tasks may be referenced (eg. by add_callback) before the register_task call
+      has been processed. Such method calls wait until the task is registered.
+    - Tasks are released (see release_tasks) when the driver no longer holds a
+      handle to them. After this, method calls for the task raise a ValueError.
+    """
+
+    def __init__(self):
+        self._tasks: Dict[TaskId, asyncio.Future[GenTask_OT]] = {}
+        self._running: Set[asyncio.Future] = set()
+        self._released: Set[TaskId] = set()
+
+    def _task_future(self, task_id: TaskId) -> "asyncio.Future[GenTask_OT]":
+        if task_id in self._released:
+            raise ValueError(f"Task {task_id} has been released")
+
+        if task_id not in self._tasks:
+            self._tasks[task_id] = asyncio.get_running_loop().create_future()
+        return self._tasks[task_id]
+
+    async def _get_task(self, task_id: TaskId) -> GenTask_OT:
+        return await self._task_future(task_id)
+
+    async def register_task(
+        self,
+        task_id: TaskId,
+        f_remote: Callable[[Any], Awaitable[Any]],
+        combiner: Callable[[Span, Try[Any]], Any],
+        attributes: AttributesDict,
+    ) -> None:
+        task_future = self._task_future(task_id)
+        if task_future.done():
+            raise ValueError(f"Task {task_id} is already registered")
+
+        task_future.set_result(
+            GenTask_OT(f_remote=f_remote, combiner=combiner, attributes=attributes)
+        )
+
+    async def release_tasks(self, task_ids: List[TaskId]) -> None:
+        """
+        Release tasks (and their results) that are no longer referenced by any task
+        handle in the driver (see _TaskRef below).
+
+        Released tasks that are still running, or that will be started by an
+        upstream task, are kept alive by these references until they complete.
+        """
+        for task_id in task_ids:
+            self._tasks.pop(task_id, None)
+            self._released.add(task_id)
+
+    async def get_metrics(self) -> Dict[str, int]:
+        """
+        Return number of tasks held by the scheduler, and the (approximate) memory
+        held by the results of completed tasks.
+        """
+        completed_tasks: List[GenTask_OT] = [
+            task_future.result()
+            for task_future in self._tasks.values()
+            if task_future.done() and task_future.result().has_completed()
+        ]
+        return {
+            "nr_live_tasks": len(self._tasks),
+            "nr_completed_live_tasks": len(completed_tasks),
+            "nr_released_tasks": len(self._released),
+            "result_bytes": sum(
+                [
+                    _result_size_bytes(await task.get_task_result())
+                    for task in completed_tasks
+                ]
+            ),
+        }
+
+    # --- methods forwarded to GenTask_OT (see RemoteTaskP) ---
+
+    async def start(self, task_id: TaskId, arg: Any) -> None:
+        """
+        Start task in background, and return without waiting for it to finish.
+        """
+        task = await self._get_task(task_id)
+
+        task_run = asyncio.ensure_future(task.start(arg))
+        self._running.add(task_run)
+        task_run.add_done_callback(self._running.discard)
+
+    async def add_callback(
+        self, task_id: TaskId, cb: Callable[[Any], Awaitable[None]]
+    ) -> None:
+        (await self._get_task(task_id)).add_callback(cb)
+
+    async def get_task_result(self, task_id: TaskId) -> Any:
+        return await (await self._get_task(task_id)).get_task_result()
+
+    async def get_task_result_without_value(self, task_id: TaskId) -> Any:
+        """
+        As get_task_result, but for TaskOutcome:s the return value is replaced by
+        None. So the caller can await a task without fetching its return value.
+        """
+        result: Any = await self.get_task_result(task_id)
+        if isinstance(result, TaskOutcome):
+            return dataclasses.replace(result, return_value=None)
+        return result
+
+    async def get_span_id(self, task_id: TaskId) -> str:
+        return await (await self._get_task(task_id)).get_span_id()
+
+    async def get_attributes(self, task_id: TaskId) -> AttributesDict:
+        return (await self._get_task(task_id)).get_attributes()
+
+    async def has_started(self, task_id: TaskId) -> bool:
+        return (await self._get_task(task_id)).has_started()
+
+    async def has_completed(self, task_id: TaskId) -> bool:
+        return (await self._get_task(task_id)).has_completed()
+
+    # --- task dependencies ---
+
+    async def add_sequence_dependency(self, from_id: TaskId, to_id: TaskId) -> None:
+        """
+        Add on_complete callback to task `from_id` so that:
+          - task `to_id` starts when task `from_id` finishes
+          - log (from_id -> to_id) dependency
+
+        TODO: error handling
+        """
+        task1: GenTask_OT = await self._get_task(from_id)
+        task2: GenTask_OT = await self._get_task(to_id)
+
+        async def task1_on_complete_handler(task1_result: Any) -> None:
+            assert task1.has_started() and task1.has_completed()
+
+            _set_dispatch_latency(task2, upstream_completed_s=time.monotonic())
+            task2_run = asyncio.ensure_future(task2.start(task1_result))
+
+            # After span_id:s of Task1 and Task2 are known, log that these have a
+            # sequential dependence
+            _log_task_dependencies(
+                from_span_ids=[await task1.get_span_id()],
+                to_span_id=await task2.get_span_id(),
+            )
+
+            await task2_run
+
+        task1.add_callback(task1_on_complete_handler)
+
+    async def add_fan_in_dependency(
+        self, from_ids: List[TaskId], to_id: TaskId
+    ) -> None:
+        """
+        Add on_complete callbacks to tasks `from_ids` so that task `to_id` is started
+        (with list of results from `from_ids` tasks) when all tasks in `from_ids`
+        have completed.
+
+        Also log these task dependencies after target task is started.
+        """
+        parallel_tasks: List[GenTask_OT] = [
+            await self._get_task(from_id) for from_id in from_ids
+        ]
+        target_task: GenTask_OT = await self._get_task(to_id)
+
+        completed_tasks: List[GenTask_OT] = []
+
+        async def _start_target_task(upstream_completed_s: float):
+            # results and span ids of all upstream tasks are available at this point
+            parallel_tasks_results, from_span_ids = await asyncio.gather(
+                asyncio.gather(*[task.get_task_result() for task in parallel_tasks]),
+                asyncio.gather(*[task.get_span_id() for task in completed_tasks]),
+            )
+
+            _set_dispatch_latency(target_task, upstream_completed_s)
+            target_task_run = asyncio.ensure_future(
+                target_task.start(list(parallel_tasks_results))
+            )
+
+            _log_task_dependencies(
+                from_span_ids=list(from_span_ids),
+                to_span_id=await target_task.get_span_id(),
+            )
+
+            await target_task_run
+
+        def make_on_complete_handler(task: GenTask_OT):
+            async def task_on_complete_handler(_: Any) -> None:
+                completed_tasks.append(task)
+
+                if len(completed_tasks) == len(parallel_tasks):
+                    await _start_target_task(upstream_completed_s=time.monotonic())
+
+            return task_on_complete_handler
+
+        for task in parallel_tasks:
+            task.add_callback(make_on_complete_handler(task))
+
+    async def run_dag(
+        self,
+        task_ids: List[TaskId],
+        edges: List[Tuple[TaskId, TaskId]],
+        arg: Any,
+        reused_results: Dict[TaskId, CachedResult] = {},
+        priorities: Dict[TaskId, float] = {},
+        max_running_tasks: Optional[int] = None,
+        failure_policy: str = "continue",
+    ) -> Dict[TaskId, Any]:
+        """
+        Run a DAG of registered tasks, and return when all tasks have completed.
+
+        Input:
+         - `task_ids` should be in topological order, and `edges` should be
+           validated (see run_dag function below).
+         - tasks without upstream dependencies are started with `arg` as argument.
+         - tasks in `reused_results` are not run, but replay the given result.
+         - if `max_running_tasks` is set, at most this many tasks are run at the same
+           time, and ready tasks are started in order of `priorities` (highest
+           first). Priorities are logged as task.priority attributes.
+         - `failure_policy` determines which tasks are cancelled when a task fails
+           (see run_dag function below).
+
+        Each task is started as soon as its upstream tasks have completed. The
+        argument to a task with one upstream task is the upstream task's result, and
+        otherwise the list of upstream results (ordered as in `edges`).
+        """
+        tasks: Dict[TaskId, GenTask_OT] = {
+            task_id: await self._get_task(task_id) for task_id in task_ids
+        }
+        for task_id, cached_result in reused_results.items():
+            tasks[task_id].reuse_result(cached_result)
+
+        for task_id, priority in priorities.items():
+            tasks[task_id].set_attribute("task.priority", priority)
+
+        def by_priority(task_ids: List[TaskId]) -> List[TaskId]:
+            return sorted(
+                task_ids, key=lambda task_id: priorities.get(task_id, 0.0), reverse=True
+            )
+
+        slots = _PrioritySlots(max_running_tasks)
+
+        upstream_ids: Dict[TaskId, List[TaskId]] = {task_id: [] for task_id in tasks}
+        downstream_ids: Dict[TaskId, List[TaskId]] = {task_id: [] for task_id in tasks}
+        for from_id, to_id in edges:
+            upstream_ids[to_id].append(from_id)
+            downstream_ids[from_id].append(to_id)
+
+        nr_upstream_pending: Dict[TaskId, int] = {
+            task_id: len(upstream_ids[task_id]) for task_id in tasks
+        }
+        upstream_completed_s: Dict[TaskId, float] = {}
+
+        async def run_task(task_id: TaskId, task_arg: Any):
+            await slots.acquire(priorities.get(task_id, 0.0))
+            if task_id in upstream_completed_s:
+                _set_dispatch_latency(tasks[task_id], upstream_completed_s[task_id])
+            task_run = asyncio.ensure_future(tasks[task_id].start(task_arg))
+
+            _log_task_dependencies(
+                from_span_ids=list(
+                    await asyncio.gather(
+                        *[
+                            tasks[from_id].get_span_id()
+                            for from_id in upstream_ids[task_id]
+                        ]
+                    )
+                ),
+                to_span_id=await tasks[task_id].get_span_id(),
+            )
+
+            # Note: task_run also includes running on_complete callbacks (ie. starting
+            # downstream tasks). So release slot as soon as the task has a result.
+            await tasks[task_id].get_task_result()
+            slots.release()
+
+            await task_run
+
+        async def get_task_arg(task_id: TaskId) -> Any:
+            upstream_results: List[Any] = list(
+                await asyncio.gather(
+                    *[
+                        tasks[from_id].get_task_result()
+                        for from_id in upstream_ids[task_id]
+                    ]
+                )
+            )
+            if len(upstream_results) == 1:
+                return upstream_results[0]
+            return upstream_results
+
+        def make_on_complete_handler(task_id: TaskId):
+            async def task_on_complete_handler(task_result: Any) -> None:
+                if getattr(task_result, "error", None) is not None:
+                    # Note: cancelled tasks still run this handler when started. So
+                    # with "skip-downstream" cancellations propagate down the DAG.
+                    if failure_policy == "skip-downstream":
+                        for to_id in downstream_ids[task_id]:
+                            tasks[to_id].cancel()
+                    elif failure_policy == "fail-fast":
+                        for task in tasks.values():
+                            task.cancel()
+
+                ready_ids: List[TaskId] = []
+                for to_id in downstream_ids[task_id]:
+                    nr_upstream_pending[to_id] -= 1
+                    if nr_upstream_pending[to_id] == 0:
+                        upstream_completed_s[to_id] = time.monotonic()
+                        ready_ids.append(to_id)
+
+                await asyncio.gather(
+                    *[
+                        run_task(to_id, await get_task_arg(to_id))
+                        for to_id in by_priority(ready_ids)
+                    ]
+                )
+
+            return task_on_complete_handler
+
+        for task_id, task in tasks.items():
+            task.add_callback(make_on_complete_handler(task_id))
+
+        await asyncio.gather(
+            *[
+                run_task(task_id, arg)
+                for task_id in by_priority(task_ids)
+                if nr_upstream_pending[task_id] == 0
+            ]
+        )
+
+        return {
+            task_id: await task.get_task_result() for task_id, task in tasks.items()
+        }
+
+
+@ray.remote(num_cpus=0)
+class DagScheduler_OT(DagScheduler, RayMypy):
+    """
+    DagScheduler run as a Ray actor.
+
+    Notes:
+    - Task bodies are not run in this actor, but are launched as plain Ray tasks (see
+      _run_task_body). Thus the per-task overhead is one remote call (instead of one
+      actor).
+    - The actor creates the ExecActorPool (see ray_helpers.py) used by task bodies,
+      so the pool lives as long as this actor.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._exec_actor_pool = get_exec_actor_pool()
+
+
+DAG_SCHEDULER_NAME = "pynb-dag-runner-scheduler"
+_created_dag_scheduler: Any = None
+
+# (executor, handle to its scheduler) while local_executor below is in use
+_local_backend: Optional[Tuple[LocalExecutor, Any]] = None
+
+
+@contextmanager
+def local_executor(max_workers: Optional[int] = None, executor_type: str = "thread"):
+    """
+    Run tasks created inside the with-block without Ray. Eg.
+
+        with local_executor(max_workers=4):
+            task1 = task_from_python_function(f1)
+            task2 = task_from_python_function(f2)
+            run_in_sequence(task1, task2)
+            start_and_await_tasks([task1], [task2])
+
+    Tasks are scheduled by a DagScheduler in a background thread of the driver, and
+    Python functions are run in a thread or process pool (see LocalExecutor in
+    local_executor.py). Tasks log the same OpenTelemetry spans as tasks run on Ray.
+    Since no Ray workers or actors are started, small DAGs start in milliseconds.
+
+    Not supported: task caches (the cache option of task_from_python_function).
+    Return values of tasks are always kept in the driver.
+    """
+    global _local_backend
+
+    if _local_backend is not None:
+        raise Exception("local_executor is already in use")
+
+    executor = LocalExecutor(max_workers=max_workers, executor_type=executor_type)
+    _local_backend = (executor, executor.actor(DagScheduler()))
+    try:
+        yield executor
+    finally:
+        _local_backend = None
+        executor.shutdown()
+
+
+def _get_local_executor() -> Optional[LocalExecutor]:
+    return None if _local_backend is None else _local_backend[0]
+
+
+def _try_f_with_timeout_guard(
+    f: Callable[[U], B],
+    timeout_s: Optional[float],
+    num_cpus: int,
+    **kwargs,
+) -> Callable[[U], Awaitable[Try[B]]]:
+    executor: Optional[LocalExecutor] = _get_local_executor()
+    if executor is not None:
+        return executor.try_f_with_timeout_guard(f, timeout_s, num_cpus, **kwargs)
+    return try_f_with_timeout_guard(
+        f=f, timeout_s=timeout_s, num_cpus=num_cpus, **kwargs
+    )
+
+
+def _get(refs: Any, timeout_s: Optional[float] = None) -> Any:
+    """
+    As ray.get, but for object refs returned by either a Ray or a local scheduler.
+    """
+    if isinstance(refs, list):
+        if any(isinstance(ref, LocalRef) for ref in refs):
+            return local_get(refs, timeout_s)
+    elif isinstance(refs, LocalRef):
+        return local_get([refs], timeout_s)[0]
+
+    return ray.get(refs, timeout=timeout_s)
+
+
+def _get_dag_scheduler():
+    """
+    Return handle to the DagScheduler_OT actor shared by all tasks in the Ray
+    namespace. The actor is created on first use.
+
+    If local_executor is in use, return handle to its scheduler instead.
+    """
+    global _created_dag_scheduler
+
+    if _local_backend is not None:
+        return _local_backend[1]
+
+    try:
+        return ray.get_actor(DAG_SCHEDULER_NAME)
+    except ValueError:
+        # Keep a handle to the created actor. Ray terminates (non-detached) actors
+        # when the handle returned on creation is garbage collected, and handles
+        # returned by ray.get_actor do not keep the actor alive.
+        _created_dag_scheduler = DagScheduler_OT.options(  # type: ignore
+            name=DAG_SCHEDULER_NAME
+        ).remote()
+        return _created_dag_scheduler
+
+
+@dataclass(frozen=True)
+class _SchedulerMethod:
+    scheduler: Any
+    method_name: str
+    task_id: TaskId
+
+    def remote(self, *args):
+        return getattr(self.scheduler, self.method_name).remote(self.task_id, *args)
+
+
+# (scheduler, task_id) for task handles that have been garbage collected, but not
+# yet released in the scheduler (see _release_dropped_tasks)
+_dropped_tasks: List[Tuple[Any, TaskId]] = []
+
+
+def _untracked_task_ref() -> None:
+    return None
+
+
+class _TaskRef:
+    """
+    Reference held by the handle returned when a task is created. When the handle
+    is garbage collected, the task is released in the scheduler.
+
+    Copies of handles passed to other processes do not hold a reference (ie. they
+    do not keep the task alive).
+    """
+
+    def __init__(self, scheduler: Any, task_id: TaskId):
+        self._scheduler = scheduler
+        self._task_id = task_id
+
+    def __reduce__(self):
+        return (_untracked_task_ref, ())
+
+    def __del__(self):
+        # No remote calls here, since __del__ may run during any allocation. The
+        # release is sent on the next call to _release_dropped_tasks.
+        _dropped_tasks.append((self._scheduler, self._task_id))
+
+
+def _release_dropped_tasks() -> None:
+    """
+    Release tasks whose handles have been garbage collected (see
+    DagScheduler.release_tasks).
+    """
+    by_scheduler: Dict[int, Tuple[Any, List[TaskId]]] = {}
+    while len(_dropped_tasks) > 0:
+        scheduler, task_id = _dropped_tasks.pop()
+        by_scheduler.setdefault(id(scheduler), (scheduler, []))[1].append(task_id)
+
+    for scheduler, task_ids in by_scheduler.values():
+        try:
+            scheduler.release_tasks.remote(task_ids)
+        except Exception:
+            # scheduler is not running anymore (eg. Ray has been shut down)
+            pass
+
+
+def get_scheduler_metrics(timeout_s: Optional[float] = None) -> Dict[str, int]:
+    """
+    Return metrics for the scheduler (Ray or local_executor) currently in use:
+     - nr_live_tasks: number of tasks held by the scheduler;
+     - nr_completed_live_tasks: number of these tasks that have completed;
+     - nr_released_tasks: number of tasks released since the scheduler was
+       started (ie. tasks whose handles have been garbage collected);
+     - result_bytes: approximate memory held by results of completed tasks.
+    """
+    _release_dropped_tasks()
+
+    # Note: the actor method keeps only a weak reference to the handle
+    scheduler = _get_dag_scheduler()
+    return _get(scheduler.get_metrics.remote(), timeout_s=timeout_s)
+
+
+@dataclass(frozen=True)
+class _TaskHandle:
+    """
+    Handle for a task registered in a DagScheduler_OT actor. Implements RemoteTaskP.
+
+    Handles can be passed to other Ray tasks/actors.
+
+    The task (and its result) is released in the scheduler when the handle returned
+    by task_from_python_function (etc.) is garbage collected, see _TaskRef. So keep
+    a handle to every task whose result is needed.
+    """
+
+    task_id: TaskId
+    scheduler: Any = field(compare=False, repr=False)
+    _ref: Optional[_TaskRef] = field(default=None, compare=False, repr=False)
+
+    def _method(self, method_name: str) -> _SchedulerMethod:
+        return _SchedulerMethod(self.scheduler, method_name, self.task_id)
+
+    @property
+    def start(self):
+        return self._method("start")
+
+    @property
+    def add_callback(self):
+        return self._method("add_callback")
+
+    @property
+    def get_task_result(self):
+        return self._method("get_task_result")
+
+    @property
+    def get_task_result_without_value(self):
+        return self._method("get_task_result_without_value")
+
+    @property
+    def get_span_id(self):
+        return self._method("get_span_id")
+
+    @property
+    def get_attributes(self):
+        return self._method("get_attributes")
+
+    @property
+    def has_started(self):
+        return self._method("has_started")
+
+    @property
+    def has_completed(self):
+        return self._method("has_completed")
+
+
+def _set_dispatch_latency(task: GenTask_OT, upstream_completed_s: float) -> None:
+    """
+    Log the time (in seconds) from when the last upstream task of `task` completed
+    (as given by time.monotonic) until `task` is started, as the
+    task.dispatch_latency_s attribute.
+
+    Should be called just before the task is started.
+    """
+    if not task.has_started():
+        task.set_attribute(
+            "task.dispatch_latency_s", time.monotonic() - upstream_completed_s
+        )
+
+
+def _log_task_dependencies(from_span_ids: List[SpanId], to_span_id: SpanId):
+    tracer = otel.trace.get_tracer(__name__)  # type: ignore
+    for from_span_id in from_span_ids:
+        with tracer.start_as_current_span("task-dependency") as span:
+            span.set_attribute("from_task_span_id", from_span_id)
+            span.set_attribute("to_task_span_id", to_span_id)
+
+
 def _task_from_remote_f(
     f_remote: Callable[[U], Awaitable[Try[B]]],
     task_type: str,
     attributes: AttributesDict = {},
     fail_message: str = "Remote function call failed",
+    return_value_to_object_store: bool = False,
+    cache: Optional[TaskCache] = None,
+    fingerprint: Optional[str] = None,
 ) -> RemoteTaskP[U, TaskOutcome[B]]:
     def _combiner(span: Span, b: Try[B]) -> TaskOutcome[B]:
         span_id = get_span_hexid(span)
@@ -207,9 +1047,39 @@ def _task_from_remote_f(
 
             return TaskOutcome(span_id=span_id, return_value=None, error=b.error)
 
+    # with local_executor, task bodies are run in the scheduler's event loop
+    run_locally: bool = _get_local_executor() is not None
+
     # TODO: ... rewrite later by refactoring GenTask_OT constructor ...
     async def untry_f(u: U) -> B:
-        try_fu: Try[B] = await f_remote(u)
+        if return_value_to_object_store and not run_locally:
+            # Only wait for outcome, and keep return value in Ray's object store.
+            # The object is owned by the scheduler actor (caller).
+            refs: Any = _run_task_body_to_object_store.remote(f_remote, u)  # type: ignore
+            try_ref, value_ref = refs
+            try_none: Try[None] = await _await_task_body(try_ref)
+            if try_none.is_success():
+                return value_ref
+            else:
+                raise try_none.error  # type: ignore
+
+        if cache is not None:
+            # f_remote also returns values logged during its execution
+            assert fingerprint is not None
+            return await run_with_cache(
+                cache, fingerprint, untry_f_remote, u  # type: ignore
+            )
+
+        return await untry_f_remote(u)
+
+    async def untry_f_remote(u: U) -> B:
+        try_fu: Try[B]
+        if run_locally:
+            try_fu = await f_remote(u)
+        else:
+            try_fu = await _await_task_body(
+                _run_task_body.remote(f_remote, u)  # type: ignore
+            )
         if try_fu.is_success():
             return try_fu.get()
         else:
@@ -218,12 +1088,21 @@ def _task_from_remote_f(
     if "task_type" in attributes:
         raise ValueError("task_type key should not be included in tags")
 
-    return GenTask_OT.remote(
+    _release_dropped_tasks()
+
+    scheduler = _get_dag_scheduler()
+    task_id: TaskId = uuid.uuid4().hex
+    scheduler.register_task.remote(
+        task_id=task_id,
         f_remote=untry_f,
         combiner=_combiner,
         attributes={**attributes, "task.task_type": task_type},
     )
 
+    return _TaskHandle(
+        task_id=task_id, scheduler=scheduler, _ref=_TaskRef(scheduler, task_id)
+    )
+
 
 def task_from_python_function(
     f: Callable[[U], B],
@@ -232,20 +1111,200 @@ def task_from_python_function(
     timeout_s: Optional[float] = None,
     attributes: AttributesDict = {},
     task_type: str = "Python",
+    return_value_to_object_store: bool = False,
+    cache: Optional[TaskCache] = None,
+    cache_key_data: Any = None,
+    retry_policy: RetryPolicy = RetryPolicy(),
+    resource_escalation: Optional[ResourceEscalation] = None,
+    memory: Optional[int] = None,
+    resources: Mapping[str, float] = {},
+    scheduling_strategy: Optional[str] = None,
+    thread_limits: Optional[Mapping[str, int]] = None,
 ) -> RemoteTaskP[U, TaskOutcome[B]]:
     """
     Lift a Python function f (U -> B) into a Task.
+
+    If return_value_to_object_store=True, the return value of f is kept in the Ray
+    object store, and the task's TaskOutcome.return_value is a Ray object ref. Thus,
+    large return values are not copied through the scheduler actor.
+
+    Return values of upstream tasks stored in the object store are resolved into
+    values before f is called (so f does not need to know which option upstream
+    tasks use).
+
+    The task is identified by a fingerprint (logged as the task.fingerprint
+    attribute) that is a hash of the function source code, attributes and
+    `cache_key_data`. Note that the fingerprint does not depend on global or closure
+    variables used by f; these can be included in `cache_key_data`.
+
+    If a `cache` is provided, the task is skipped when the cache contains a result for
+    the same fingerprint and upstream return values. Values logged by the task are
+    then replayed from the cache.
+
+    Failed calls are retried (at most max_nr_retries calls in total) as determined by
+    `retry_policy` (see RetryPolicy in ray_helpers.py). If a `resource_escalation` is
+    provided, retries are run with increased timeout and/or CPUs (logged as
+    run.timeout_s and run.num_cpus attributes, see ResourceEscalation).
+
+    Besides `num_cpus`, the function can request `memory` (in bytes), custom Ray
+    `resources` (eg. {"GPU": 1}), and a Ray `scheduling_strategy` ("SPREAD" or
+    "DEFAULT") for the ExecActor evaluating it. Requested resources are logged as
+    task.memory, task.resources.<name> and task.scheduling_strategy attributes (see
+    ResourceShape in ray_helpers.py).
+
+    By default, thread pools of numerical libraries (eg. OMP_NUM_THREADS) are limited
+    to num_cpus threads (see default_thread_limits in ray_helpers.py). Other limits
+    can be set with `thread_limits` (eg. {} for no limits). The limits are logged as
+    run.env.<variable> attributes.
     """
-    try_f_remote: Callable[[U], Awaitable[Try[B]]] = try_f_with_timeout_guard(
-        f=f, timeout_s=timeout_s, num_cpus=num_cpus
+    if cache is not None and return_value_to_object_store:
+        raise ValueError(
+            "cache and return_value_to_object_store options can not be combined"
+        )
+
+    if cache is not None and _get_local_executor() is not None:
+        raise ValueError("cache option is not supported with local_executor")
+
+    f_task: Callable[[U], Any] = compose(f, _resolve_return_values)
+    if cache is not None:
+        f_task = _record_logged_values(f_task)
+
+    try_f_remote: Callable[[U], Awaitable[Try[B]]] = _try_f_with_timeout_guard(
+        f=f_task,
+        timeout_s=timeout_s,
+        num_cpus=num_cpus,
+        resource_escalation=resource_escalation,
+        memory=memory,
+        resources=resources,
+        scheduling_strategy=scheduling_strategy,
+        thread_limits=thread_limits,
     )
 
     try_f_remote_wrapped: Callable[[U], Awaitable[Try[B]]] = retry_wrapper_ot(
-        try_f_remote, max_nr_retries=max_nr_retries
+        try_f_remote, max_nr_retries=max_nr_retries, retry_policy=retry_policy
+    )
+
+    fingerprint: str = get_fingerprint(
+        (get_function_source(f), attributes, task_type, cache_key_data)
     )
 
     return _task_from_remote_f(
-        try_f_remote_wrapped, attributes=attributes, task_type=task_type
+        try_f_remote_wrapped,
+        attributes={**attributes, "task.fingerprint": fingerprint},
+        task_type=task_type,
+        return_value_to_object_store=return_value_to_object_store,
+        cache=cache,
+        fingerprint=fingerprint,
+    )
+
+
+def map_task(
+    f: Callable[[U], B],
+    chunk_size: int = 1,
+    max_parallel: Optional[int] = None,
+    num_cpus: int = 1,
+    max_nr_retries: int = 1,
+    timeout_s: Optional[float] = None,
+    attributes: AttributesDict = {},
+    task_type: str = "Python",
+    retry_policy: RetryPolicy = RetryPolicy(),
+    resource_escalation: Optional[ResourceEscalation] = None,
+    memory: Optional[int] = None,
+    resources: Mapping[str, float] = {},
+    scheduling_strategy: Optional[str] = None,
+    thread_limits: Optional[Mapping[str, int]] = None,
+) -> RemoteTaskP[TaskOutcome[Sequence[U]], TaskOutcome[List[B]]]:
+    """
+    Lift a Python function f (U -> B) into a Task that maps f over a list whose
+    length is only known at run time, eg. the return value of an upstream task:
+
+       list_task ---> map_task(f)
+
+    The input list is split into chunks of `chunk_size` items, and at most
+    `max_parallel` chunks (None = no limit) are evaluated at the same time. Each
+    chunk is evaluated as one Python function call with timeout and retries (as in
+    task_from_python_function, with the same retry and resource options for all
+    chunks), and is logged with its own retry-wrapper
+    and retry-call spans (with a run.chunk_nr attribute).
+
+    The task returns the list of f(item) for all items (in input order). If any
+    chunk fails (after retries), the task fails with the error of the first failed
+    chunk.
+
+    The task can be started either with a TaskOutcome (from an upstream task) or
+    a list of items. If the upstream task has failed, the task fails without
+    calling f.
+    """
+    if chunk_size < 1:
+        raise ValueError("chunk_size should be a positive integer")
+
+    if max_parallel is not None and max_parallel < 1:
+        raise ValueError("max_parallel should be None or a positive integer")
+
+    def f_chunk(chunk: List[U]) -> List[B]:
+        return [f(item) for item in chunk]
+
+    try_f_chunk_remote: Callable[
+        [List[U]], Awaitable[Try[List[B]]]
+    ] = _try_f_with_timeout_guard(
+        f=f_chunk,
+        timeout_s=timeout_s,
+        num_cpus=num_cpus,
+        resource_escalation=resource_escalation,
+        memory=memory,
+        resources=resources,
+        scheduling_strategy=scheduling_strategy,
+        thread_limits=thread_limits,
+    )
+
+    async def map_f_remote(arg: Any) -> Try[List[B]]:
+        arg = _resolve_return_values(arg)
+        if isinstance(arg, TaskOutcome):
+            if arg.error is not None:
+                return Try(None, Exception("Upstream task failed"))
+            arg = arg.return_value
+
+        items: List[U] = list(arg)
+        chunks: List[List[U]] = [
+            items[k : k + chunk_size] for k in range(0, len(items), chunk_size)
+        ]
+        slots = asyncio.Semaphore(len(chunks) if max_parallel is None else max_parallel)
+
+        async def run_chunk(chunk_nr: int, chunk: List[U]) -> Try[List[B]]:
+            async with slots:
+                return await retry_wrapper_ot(
+                    try_f_chunk_remote,
+                    max_nr_retries=max_nr_retries,
+                    attributes={"run.chunk_nr": chunk_nr},
+                    retry_policy=retry_policy,
+                )(chunk)
+
+        chunk_results: List[Try[List[B]]] = await asyncio.gather(
+            *[run_chunk(chunk_nr, chunk) for chunk_nr, chunk in enumerate(chunks)]
+        )
+
+        for chunk_result in chunk_results:
+            if not chunk_result.is_success():
+                return Try(None, chunk_result.error)
+
+        return Try(
+            [b for chunk_result in chunk_results for b in chunk_result.get()], None
+        )
+
+    map_attributes: AttributesDict = {
+        **attributes,
+        "task.chunk_size": chunk_size,
+        **({} if max_parallel is None else {"task.max_parallel": max_parallel}),
+    }
+
+    fingerprint: str = get_fingerprint(
+        (get_function_source(f), map_attributes, task_type, "map_task")
+    )
+
+    return _task_from_remote_f(
+        map_f_remote,
+        attributes={**map_attributes, "task.fingerprint": fingerprint},
+        task_type=task_type,
     )
 
 
@@ -257,28 +1316,9 @@ def _cb_compose_tasks(
     Add on_complete callback to task1 so that:
       - task2 starts when task1 finishes
       - log (task1 -> task2) dependency
-
-    TODO: error handling
     """
-
-    async def task1_on_complete_handler(task1_result: TaskOutcome[A]) -> None:
-        assert await task1.has_started.remote() == True
-        assert await task1.has_completed.remote() == True
-
-        task1_span_id = await task1.get_span_id.remote()
-        task2_awaitable = task2.start.remote(task1_result)  # type: ignore
-        task2_span_id = await task2.get_span_id.remote()
-
-        # After span_id:s of Task1 and Task2 are known, log that these have a
-        # sequential dependence
-        tracer = otel.trace.get_tracer(__name__)  # type: ignore
-        with tracer.start_as_current_span("task-dependency") as span:
-            span.set_attribute("from_task_span_id", task1_span_id)
-            span.set_attribute("to_task_span_id", task2_span_id)
-
-        await task2_awaitable
-
-    ray.get(task1.add_callback.remote(task1_on_complete_handler))  # type: ignore
+    scheduler = _get_dag_scheduler()
+    _get(scheduler.add_sequence_dependency.remote(task1.task_id, task2.task_id))
 
 
 def run_in_sequence(*tasks: RemoteTaskP[TaskOutcome[A], TaskOutcome[A]]):
@@ -323,44 +1363,121 @@ def fan_in(
     if target_task in paralllel_tasks:
         raise ValueError("Task listed in both arguments of fan_in")
 
-    @ray.remote(num_cpus=0)
-    class TargetTaskTrigger:
-        def __init__(self):
-            self._completed_tasks = []
+    scheduler = _get_dag_scheduler()
+    _get(
+        scheduler.add_fan_in_dependency.remote(
+            [task.task_id for task in paralllel_tasks], target_task.task_id
+        )
+    )
 
-        async def _start_target_task(self):
-            parallel_tasks_results: List[TaskOutcome[B]] = [
-                await task.get_task_result.remote() for task in paralllel_tasks
-            ]
-            target_task_awaitable = target_task.start.remote(parallel_tasks_results)  # type: ignore
 
-            target_span_id = await target_task.get_span_id.remote()
+def _keep_outcomes(outcomes: List[TaskOutcome[A]]) -> List[TaskOutcome[A]]:
+    return outcomes
 
-            # Log task dependencies
-            tracer = otel.trace.get_tracer(__name__)  # type: ignore
-            for task in self._completed_tasks:
-                with tracer.start_as_current_span("task-dependency") as span:
-                    span.set_attribute(
-                        "from_task_span_id", await task.get_span_id.remote()
-                    )
-                    span.set_attribute("to_task_span_id", target_span_id)
 
-            await target_task_awaitable
+def _concatenate_outcomes(
+    outcomes: List[TaskOutcome[List[TaskOutcome[A]]]],
+) -> List[TaskOutcome[A]]:
+    return [
+        outcome
+        for combine_outcome in outcomes
+        for outcome in (combine_outcome.return_value or [])
+    ]
+
+
+def tree_fan_in(
+    paralllel_tasks: List[RemoteTaskP[TaskOutcome[A], TaskOutcome[B]]],
+    target_task: RemoteTaskP[List[TaskOutcome[Any]], TaskOutcome[C]],
+    branching_factor: int = 16,
+    combine_fns: List[Callable[[List[TaskOutcome[Any]]], Any]] = [],
+) -> List[RemoteTaskP]:
+    """
+    As fan_in, but for very wide fan-ins: upstream results are combined in a tree of
+    intermediate "combine" tasks where each task has at most `branching_factor`
+    upstream tasks, eg. for branching_factor=2:
+
+       task1 ---> combine ---\
+       task2 ----/            \
+                               v
+       task3 ---> combine ---> target_task
+       task4 ----/
+
+    The combine tasks on each level run in parallel (as Python tasks), and keep
+    their return values in the Ray object store. So neither the scheduler actor nor
+    any single task needs to hold all upstream results at the same time.
+
+    `combine_fns[k]` is the function (List[TaskOutcome] -> value) run by combine
+    tasks on level k (level 0 combines the `paralllel_tasks`). If there are fewer
+    functions than levels, the last function is used for the remaining levels. By
+    default, combine tasks return the list of upstream TaskOutcome:s of the
+    `paralllel_tasks` (in order).
+
+    `target_task` is started with the list of TaskOutcome:s of the top-level
+    combine tasks (or of `paralllel_tasks` if there are at most `branching_factor`
+    of these).
+
+    Returns:
+      list of created combine tasks (combine tasks are logged with a
+      task.fan_in_level attribute)
+    """
+    if len(paralllel_tasks) == 0:
+        raise ValueError("Called with zero length task list.")
+
+    if branching_factor < 2:
+        raise ValueError("branching_factor should be at least 2")
+
+    combine_tasks: List[RemoteTaskP] = []
+    level_tasks: List[RemoteTaskP] = list(paralllel_tasks)
+    level: int = 0
 
-        async def record_completed_task(self, task):
-            self._completed_tasks.append(task)
+    while len(level_tasks) > branching_factor:
+        if len(combine_fns) > 0:
+            combine_fn = combine_fns[min(level, len(combine_fns) - 1)]
+        else:
+            combine_fn = _keep_outcomes if level == 0 else _concatenate_outcomes
+
+        next_level_tasks: List[RemoteTaskP] = []
+        for k in range(0, len(level_tasks), branching_factor):
+            combine_task = task_from_python_function(
+                combine_fn,
+                attributes={"task.fan_in_level": level},
+                return_value_to_object_store=True,
+            )
+            fan_in(level_tasks[k : k + branching_factor], combine_task)
+            next_level_tasks.append(combine_task)
+
+        combine_tasks += next_level_tasks
+        level_tasks = next_level_tasks
+        level += 1
 
-            if len(self._completed_tasks) == len(paralllel_tasks):
-                await self._start_target_task()
+    fan_in(level_tasks, target_task)
 
-    target_task_trigger = TargetTaskTrigger.remote()  # type: ignore
+    return combine_tasks
 
-    for task in paralllel_tasks:
 
-        async def task_on_complete_handler(task_result: TaskOutcome[B]) -> None:
-            await target_task_trigger.record_completed_task.remote(task)
+def _start_and_get_result_refs(
+    tasks_to_start: List[RemoteTaskP[A, A]],
+    tasks_to_await: List[RemoteTaskP[A, A]],
+    arg: Any,
+    fetch_return_values: bool,
+) -> Dict[Any, RemoteTaskP[A, A]]:
+    if len(tasks_to_start) == 0:
+        raise ValueError("No tasks to start")
+
+    if len(tasks_to_await) == 0:
+        raise ValueError("No tasks to await")
 
-        ray.get(task.add_callback.remote(task_on_complete_handler))  # type: ignore
+    for task in tasks_to_start:
+        task.start.remote(arg)
+
+    return {
+        (
+            task.get_task_result.remote()
+            if fetch_return_values
+            else task.get_task_result_without_value.remote()
+        ): task
+        for task in tasks_to_await
+    }
 
 
 def start_and_await_tasks(
@@ -386,15 +1503,224 @@ def start_and_await_tasks(
     assert isinstance(tasks_to_start, list)
     assert isinstance(tasks_to_await, list)
 
-    if len(tasks_to_start) == 0:
-        raise ValueError("No tasks to start")
+    result_refs: Dict[Any, RemoteTaskP[A, A]] = _start_and_get_result_refs(
+        tasks_to_start, tasks_to_await, arg, fetch_return_values=True
+    )
+    return _get(list(result_refs.keys()), timeout_s=timeout_s)
 
-    if len(tasks_to_await) == 0:
-        raise ValueError("No tasks to await")
 
-    for task in tasks_to_start:
-        task.start.remote(arg)
+def as_completed(
+    tasks_to_start: List[RemoteTaskP[A, A]],
+    tasks_to_await: List[RemoteTaskP[A, A]],
+    timeout_s: Optional[float] = None,
+    arg=None,
+    fetch_return_values: bool = True,
+) -> Iterator[Tuple[RemoteTaskP[A, A], A]]:
+    """
+    As start_and_await_tasks, but return a generator that yields (task, result)
+    tuples for the tasks in `tasks_to_await` in the order they complete. Eg.
+
+        for task, outcome in as_completed([task1], [task2, task3]):
+            ...
+
+    If fetch_return_values=False, the return values of TaskOutcome:s are None (and
+    return values are not copied to the driver). Errors are still returned.
+
+    timeout_s: Optionally limit the total time to wait for all tasks, with values
+    None (no timeout), or timeout in seconds. On timeout, the generator raises
+    ray.exceptions.GetTimeoutError (as ray.get).
+    """
+    deadline_s: Optional[float] = (
+        None if timeout_s is None else time.monotonic() + timeout_s
+    )
+    pending: Dict[Any, RemoteTaskP[A, A]] = _start_and_get_result_refs(
+        tasks_to_start, tasks_to_await, arg, fetch_return_values
+    )
+
+    while len(pending) > 0:
+        remaining_s: Optional[float] = (
+            None if deadline_s is None else max(0, deadline_s - time.monotonic())
+        )
+        refs_done: List[Any]
+        if isinstance(next(iter(pending)), LocalRef):
+            futures_done, _ = concurrent.futures.wait(
+                [ref.future() for ref in pending],
+                timeout=remaining_s,
+                return_when=concurrent.futures.FIRST_COMPLETED,
+            )
+            refs_done = [ref for ref in pending if ref.future() in futures_done][:1]
+        else:
+            refs_done, _ = ray.wait(
+                list(pending.keys()), num_returns=1, timeout=remaining_s
+            )
+
+        if len(refs_done) == 0:
+            raise ray.exceptions.GetTimeoutError(
+                f"{len(pending)} task(s) did not complete within timeout"
+            )
+
+        [ref] = refs_done
+        yield pending.pop(ref), _get(ref)
 
-    return ray.get(
-        [task.get_task_result.remote() for task in tasks_to_await], timeout=timeout_s
+
+async def as_completed_async(
+    tasks_to_start: List[RemoteTaskP[A, A]],
+    tasks_to_await: List[RemoteTaskP[A, A]],
+    timeout_s: Optional[float] = None,
+    arg=None,
+    fetch_return_values: bool = True,
+) -> AsyncIterator[Tuple[RemoteTaskP[A, A], A]]:
+    """
+    Async version of as_completed, eg.
+
+        async for task, outcome in as_completed_async([task1], [task2, task3]):
+            ...
+    """
+    deadline_s: Optional[float] = (
+        None if timeout_s is None else time.monotonic() + timeout_s
+    )
+    pending: Dict[asyncio.Future, RemoteTaskP[A, A]] = {
+        asyncio.wrap_future(ref.future()): task
+        for ref, task in _start_and_get_result_refs(
+            tasks_to_start, tasks_to_await, arg, fetch_return_values
+        ).items()
+    }
+
+    while len(pending) > 0:
+        futures_done, _ = await asyncio.wait(
+            list(pending.keys()),
+            timeout=(
+                None if deadline_s is None else max(0, deadline_s - time.monotonic())
+            ),
+            return_when=asyncio.FIRST_COMPLETED,
+        )
+        if len(futures_done) == 0:
+            raise ray.exceptions.GetTimeoutError(
+                f"{len(pending)} task(s) did not complete within timeout"
+            )
+
+        for future in futures_done:
+            yield pending.pop(future), future.result()
+
+
+def get_task_fingerprints(tasks: List[RemoteTaskP]) -> List[str]:
+    """
+    Return the task.fingerprint attribute of tasks (see task_from_python_function).
+    """
+    return [
+        attributes["task.fingerprint"]
+        for attributes in _get([task.get_attributes.remote() for task in tasks])
+    ]
+
+
+def run_dag(
+    tasks: List[RemoteTaskP],
+    edges: List[Tuple[RemoteTaskP, RemoteTaskP]],
+    timeout_s: float = None,
+    arg=None,
+    reused_results: Dict[RemoteTaskP, CachedResult] = {},
+    duration_estimates_s: Dict[RemoteTaskP, float] = {},
+    failure_policy: str = "continue",
+) -> List[TaskOutcome]:
+    """
+    Run a DAG of tasks, and return when all tasks have finished.
+
+    The DAG is given up front as a list of tasks and a list of (from, to) edges, eg.
+
+        tasks = [task1, task2, task3, task4]
+        edges = [(task1, task2), (task1, task3), (task2, task4), (task3, task4)]
+
+    defines the DAG
+
+       task1  --->  task2  --->  task4
+         |                         ^
+         +-------->  task3  -------+
+
+    Before any task is started, the DAG is validated (no cycles, duplicate edges or
+    edges to tasks not in `tasks`) and sent to the scheduler in one remote call. The
+    scheduler then starts each task as soon as its upstream tasks have completed:
+     - tasks with no upstream tasks are started with `arg` as argument;
+     - tasks with one upstream task are started with the TaskOutcome of that task
+       as argument (as in run_in_sequence);
+     - tasks with multiple upstream tasks are started with a list of TaskOutcome:s
+       (as in fan_in).
+
+    Task dependencies are logged as in run_in_sequence and fan_in.
+
+    Tasks in `reused_results` are not run, but instead replay a result from a
+    previous run (see run_dag_incremental).
+
+    If `duration_estimates_s` are given (eg. from a previous run, see
+    duration_estimates.py), tasks are prioritized by critical path: the priority
+    of a task is the longest estimated duration from its start to the end of the DAG.
+    Then at most (number of CPUs in the Ray cluster) tasks are run at the same time,
+    and ready tasks are started in priority order. Tasks without an estimate are
+    assumed to have the mean duration of the estimated tasks.
+
+    `failure_policy` determines what happens when a task fails:
+     - "continue": downstream tasks are run (with the failed TaskOutcome in their
+       input);
+     - "skip-downstream": all tasks downstream of the failed task are cancelled,
+       but other tasks are run;
+     - "fail-fast": all tasks that have not completed are cancelled, and running
+       tasks are interrupted (ie. their ExecActor:s are killed).
+
+    Cancelled tasks complete with a TaskCancelledError, and are logged with a
+    task.cancelled attribute (so they can be told apart from tasks that failed).
+
+    timeout_s: Optionally limit compute time with timeout with values
+    None (no timeout), or timeout in seconds
+
+    Returns:
+      list of TaskOutcome:s for the tasks in `tasks` (in the same order)
+    """
+    if len(tasks) == 0:
+        raise ValueError("No tasks in DAG")
+
+    if failure_policy not in FAILURE_POLICIES:
+        raise ValueError(f"Unknown failure policy {failure_policy}")
+
+    task_ids: List[TaskId] = [task.task_id for task in tasks]
+    edge_ids: List[Tuple[TaskId, TaskId]] = [
+        (task1.task_id, task2.task_id) for task1, task2 in edges
+    ]
+    if len(set(edge_ids)) != len(edge_ids):
+        raise ValueError("DAG contains duplicate edges")
+
+    # raises ValueError if DAG contains cycles or edges to unknown tasks
+    topological_order: List[TaskId] = topological_sort(task_ids, edge_ids)
+
+    priorities: Dict[TaskId, float] = {}
+    max_running_tasks: Optional[int] = None
+    if len(duration_estimates_s) > 0:
+        default_duration_s: float = sum(duration_estimates_s.values()) / len(
+            duration_estimates_s
+        )
+        priorities = longest_path_weights(
+            task_ids,
+            edge_ids,
+            weights={
+                task.task_id: duration_estimates_s.get(task, default_duration_s)
+                for task in tasks
+            },
+        )
+        executor: Optional[LocalExecutor] = _get_local_executor()
+        if executor is not None:
+            max_running_tasks = executor.max_workers
+        else:
+            max_running_tasks = max(1, int(ray.cluster_resources().get("CPU", 1)))
+
+    scheduler = _get_dag_scheduler()
+    outcomes: Dict[TaskId, TaskOutcome] = _get(
+        scheduler.run_dag.remote(
+            topological_order,
+            edge_ids,
+            arg,
+            {task.task_id: result for task, result in reused_results.items()},
+            priorities,
+            max_running_tasks,
+            failure_policy,
+        ),
+        timeout_s=timeout_s,
     )
+    return [outcomes[task_id] for task_id in task_ids]
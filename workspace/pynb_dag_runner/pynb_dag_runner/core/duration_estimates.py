@@ -0,0 +1,62 @@
+from typing import Dict, List
+
+#
+from pynb_dag_runner.core.dag_runner import RemoteTaskP, get_task_fingerprints
+from pynb_dag_runner.opentelemetry_helpers import Spans, get_duration_s
+
+Fingerprint = str
+
+
+def get_historical_durations_s(spans: Spans) -> Dict[Fingerprint, float]:
+    """
+    From logged spans, return the duration (in seconds) of the last successful run
+    of each task, indexed by task fingerprint (see task_from_python_function).
+
+    Tasks that were not executed (ie. cache hits, or reused results in incremental
+    runs) are ignored.
+    """
+    result: Dict[Fingerprint, float] = {}
+
+    for task_span in (
+        spans.filter(["name"], "execute-task")
+        # -
+        .filter(["status", "status_code"], "OK")
+        # -
+        .sort_by_start_time()
+    ):
+        attributes = task_span["attributes"]
+        if "task.fingerprint" not in attributes:
+            continue
+
+        if attributes.get("task.cache_hit", False) or attributes.get(
+            "task.reused", False
+        ):
+            continue
+
+        result[attributes["task.fingerprint"]] = get_duration_s(task_span)
+
+    return result
+
+
+def duration_estimates_from_spans(
+    tasks: List[RemoteTaskP], spans: Spans
+) -> Dict[RemoteTaskP, float]:
+    """
+    Return estimated durations (in seconds) for tasks based on the spans of previous
+    runs, eg.
+
+        run_dag(
+            tasks,
+            edges,
+            duration_estimates_s=duration_estimates_from_spans(tasks, spans),
+        )
+
+    Tasks without a previous successful run are not included.
+    """
+    historical_durations_s: Dict[Fingerprint, float] = get_historical_durations_s(spans)
+
+    return {
+        task: historical_durations_s[fingerprint]
+        for task, fingerprint in zip(tasks, get_task_fingerprints(tasks))
+        if fingerprint in historical_durations_s
+    }
@@ -0,0 +1,180 @@
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+#
+from pynb_dag_runner.core.dag_runner import (
+    RemoteTaskP,
+    TaskOutcome,
+    get_task_fingerprints,
+    run_dag,
+)
+from pynb_dag_runner.core.task_cache import CachedResult
+from pynb_dag_runner.helpers import topological_sort
+from pynb_dag_runner.opentelemetry_helpers import SpanId, Spans
+from pynb_dag_runner.opentelemetry_task_span_parser import get_pipeline_iterators
+from pynb_dag_runner.tasks.task_opentelemetry_logging import LoggedValue
+
+Fingerprint = str
+
+
+@dataclass(frozen=True)
+class PreviousTaskRun:
+    span_id: SpanId
+    upstream_fingerprints: Tuple[Fingerprint, ...]
+    result: CachedResult
+
+
+def get_previous_task_runs(spans: Spans) -> Dict[Fingerprint, PreviousTaskRun]:
+    """
+    From the spans of a previous pipeline run, return the successful tasks indexed by
+    their fingerprint (see task_from_python_function).
+
+    For each task, the values and artefacts logged by its last (successful) run are
+    recorded. Return values of tasks are not logged, and are set to None.
+    """
+    pipeline_dict, task_iterator = get_pipeline_iterators(spans)
+
+    fingerprints: Dict[SpanId, Fingerprint] = {}
+    task_runs: Dict[SpanId, Tuple[Fingerprint, CachedResult]] = {}
+
+    for task_dict, run_iterator in task_iterator:
+        fingerprint: Optional[Fingerprint] = task_dict["attributes"].get(
+            "task.fingerprint"
+        )
+        if fingerprint is None:
+            # task logged before fingerprints were introduced
+            continue
+        fingerprints[task_dict["span_id"]] = fingerprint
+
+        if task_dict["status"]["status_code"] != "OK":
+            continue
+
+        logged_values: List[LoggedValue] = []
+        for run_dict, artefacts in run_iterator:
+            if run_dict["status"]["status_code"] != "OK":
+                continue
+
+            logged_values = [
+                {
+                    "name": name,
+                    "content": value_dict["value"],
+                    "content_type": value_dict["type"],
+                    "is_file": False,
+                }
+                for name, value_dict in run_dict["logged_values"].items()
+            ] + [
+                {
+                    "name": artefact["name"],
+                    "content": artefact["content"],
+                    "content_type": artefact["type"],
+                    "is_file": True,
+                }
+                for artefact in artefacts
+            ]
+
+        task_runs[task_dict["span_id"]] = (
+            fingerprint,
+            CachedResult(return_value=None, logged_values=logged_values),
+        )
+
+    upstream_fingerprints: Dict[SpanId, List[Fingerprint]] = {
+        span_id: [] for span_id in task_runs
+    }
+    for from_span_id, to_span_id in pipeline_dict["task_dependencies"]:
+        if to_span_id in upstream_fingerprints and from_span_id in fingerprints:
+            upstream_fingerprints[to_span_id].append(fingerprints[from_span_id])
+
+    return {
+        fingerprint: PreviousTaskRun(
+            span_id=span_id,
+            upstream_fingerprints=tuple(sorted(upstream_fingerprints[span_id])),
+            result=result,
+        )
+        for span_id, (fingerprint, result) in task_runs.items()
+    }
+
+
+def get_invalidated_tasks(
+    fingerprints: Dict[Any, Fingerprint],
+    edges: List[Tuple[Any, Any]],
+    previous_task_runs: Dict[Fingerprint, PreviousTaskRun],
+) -> Set[Any]:
+    """
+    Return the tasks in a DAG that need to be rerun given the tasks of a previous run.
+
+    A task is invalidated if:
+     - there is no successful task with the same fingerprint in the previous run
+       (eg. the task source or parameters have changed, or the task is new);
+     - the fingerprints of its upstream tasks have changed (eg. a dependency has been
+       added or removed);
+     - any of its upstream tasks is invalidated.
+
+    Input:
+     - `fingerprints`: dict with task fingerprint for every task in the DAG
+     - `edges`: list of (from, to) task dependencies
+    """
+    upstream: Dict[Any, List[Any]] = {task: [] for task in fingerprints}
+    for from_task, to_task in edges:
+        upstream[to_task].append(from_task)
+
+    invalidated: Set[Any] = set()
+    for task in topological_sort(list(fingerprints.keys()), edges):
+        previous_run: Optional[PreviousTaskRun] = previous_task_runs.get(
+            fingerprints[task]
+        )
+        upstream_fingerprints: Tuple[Fingerprint, ...] = tuple(
+            sorted(fingerprints[from_task] for from_task in upstream[task])
+        )
+
+        if (
+            previous_run is None
+            or previous_run.upstream_fingerprints != upstream_fingerprints
+            or any(from_task in invalidated for from_task in upstream[task])
+        ):
+            invalidated.add(task)
+
+    return invalidated
+
+
+def run_dag_incremental(
+    tasks: List[RemoteTaskP],
+    edges: List[Tuple[RemoteTaskP, RemoteTaskP]],
+    previous_spans: Spans,
+    timeout_s: float = None,
+    arg=None,
+) -> List[TaskOutcome]:
+    """
+    Run a DAG of tasks as run_dag, but only rerun tasks that are invalidated compared
+    to a previous run of the pipeline (see get_invalidated_tasks). Input
+    `previous_spans` are the spans logged by the previous run (ie. the same input as
+    for the pynb_log_parser cli).
+
+    The remaining tasks are not run, but replay the values and artefacts logged in
+    the previous run. These tasks are marked with a task.reused attribute.
+
+    Note:
+     - Return values of tasks are not logged. Thus, tasks that are not rerun return
+       None. This is intended for pipelines where tasks do not communicate with return
+       values (like notebook pipelines).
+    """
+    fingerprints: Dict[RemoteTaskP, Fingerprint] = dict(
+        zip(tasks, get_task_fingerprints(tasks))
+    )
+    previous_task_runs: Dict[Fingerprint, PreviousTaskRun] = get_previous_task_runs(
+        previous_spans
+    )
+    invalidated: Set[RemoteTaskP] = get_invalidated_tasks(
+        fingerprints, edges, previous_task_runs
+    )
+
+    return run_dag(
+        tasks=tasks,
+        edges=edges,
+        timeout_s=timeout_s,
+        arg=arg,
+        reused_results={
+            task: previous_task_runs[fingerprints[task]].result
+            for task in tasks
+            if task not in invalidated
+        },
+    )
@@ -0,0 +1,192 @@
+import asyncio, hashlib, inspect, os, pickle, uuid
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Awaitable, Callable, List, Optional, Tuple, TypeVar
+
+#
+import ray
+import opentelemetry as otel
+from opentelemetry.trace import StatusCode, Status  # type: ignore
+
+#
+from pynb_dag_runner.tasks.task_opentelemetry_logging import (
+    LoggedValue,
+    _replay_logged_values,
+)
+
+U = TypeVar("U")
+B = TypeVar("B")
+
+CacheKey = str
+
+
+@dataclass(frozen=True)
+class CachedResult:
+    return_value: Any
+    logged_values: List[LoggedValue]
+
+
+class TaskCache:
+    """
+    Content-addressed on-disk cache for task results.
+
+    Each entry is stored as one pickle file named by its key. When the total size of
+    the entries exceed `max_size_bytes`, the least recently used entries are evicted.
+
+    Notes:
+    - Cache lookups are done by the scheduler actor (see dag_runner.py). So
+      `cache_dir` should be a directory on the Ray head node.
+    - Only successful task runs are cached.
+    """
+
+    def __init__(self, cache_dir: Path, max_size_bytes: int = 2**30):
+        assert max_size_bytes > 0
+
+        self.cache_dir = Path(cache_dir)
+        self.max_size_bytes = max_size_bytes
+
+    def _entry_path(self, key: CacheKey) -> Path:
+        return self.cache_dir / f"{key}.pickle"
+
+    def get(self, key: CacheKey) -> Optional[CachedResult]:
+        entry_path = self._entry_path(key)
+
+        try:
+            result = pickle.loads(entry_path.read_bytes())
+            # update modification time (used for determining least recently used)
+            os.utime(entry_path)
+        except (FileNotFoundError, EOFError, pickle.UnpicklingError):
+            return None
+
+        assert isinstance(result, CachedResult)
+        return result
+
+    def put(self, key: CacheKey, result: CachedResult) -> None:
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+        # write to temp file and rename, so concurrent readers never see partial data
+        tmp_path = self.cache_dir / f"{key}.{uuid.uuid4().hex}.tmp"
+        tmp_path.write_bytes(pickle.dumps(result))
+        os.replace(tmp_path, self._entry_path(key))
+
+        self._evict()
+
+    def _evict(self) -> None:
+        entries: List[Tuple[float, int, Path]] = []
+        for entry_path in self.cache_dir.glob("*.pickle"):
+            try:
+                stat = entry_path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry_path))
+
+        total_size: int = sum(size for _, size, _ in entries)
+        for _, size, entry_path in sorted(entries):
+            if total_size <= self.max_size_bytes:
+                break
+
+            entry_path.unlink(missing_ok=True)
+            total_size -= size
+
+
+def get_function_source(f: Callable) -> str:
+    """
+    Return source code of a function (for use in task fingerprints).
+
+    Note: the source code does not include values of any global or closure variables
+    that the function depends on.
+    """
+    try:
+        return inspect.getsource(f)
+    except (OSError, TypeError):
+        # source is not available (eg. for functions defined in a REPL)
+        return f.__code__.co_code.hex()
+
+
+def _arg_key_data(arg: Any) -> Any:
+    """
+    Return the data in a task argument that should determine the cache key: the
+    return values and errors of upstream TaskOutcome:s (but not eg. their span ids).
+    """
+    # import here to avoid circular imports
+    from pynb_dag_runner.core.dag_runner import TaskOutcome, _resolve_return_values
+
+    if isinstance(arg, list):
+        return [_arg_key_data(a) for a in arg]
+
+    if isinstance(arg, TaskOutcome):
+        arg = _resolve_return_values(arg)
+        return ("TaskOutcome", arg.return_value, repr(arg.error))
+
+    return arg
+
+
+def get_fingerprint(key_data: Any) -> str:
+    """
+    Return sha256 hash of (picklable) data identifying a task, eg. its source code
+    and parameters.
+    """
+    return hashlib.sha256(ray.cloudpickle.dumps(key_data)).hexdigest()
+
+
+@ray.remote(num_cpus=0)
+def _compute_cache_key(fingerprint: str, arg: Any) -> CacheKey:
+    """
+    Compute cache key in a Ray task so that (possibly large) upstream values are not
+    fetched into the scheduler actor.
+    """
+    return get_fingerprint((fingerprint, _arg_key_data(arg)))
+
+
+def replay_cached_result(cached_result: CachedResult) -> Any:
+    """
+    Replay values logged by a cached task, and return its cached return value.
+
+    Logged values are replayed in a run span, so that the replay is reported as a
+    task run by the span parser (see opentelemetry_task_span_parser.py).
+    """
+    tracer = otel.trace.get_tracer(__name__)  # type: ignore
+    with tracer.start_as_current_span("retry-call") as run_span:
+        run_span.set_attribute("run.retry_nr", 0)
+        run_span.set_attribute("run.cached", True)
+        _replay_logged_values(cached_result.logged_values)
+        run_span.set_status(Status(StatusCode.OK))
+
+    return cached_result.return_value
+
+
+async def run_with_cache(
+    cache: TaskCache,
+    fingerprint: str,
+    f: Callable[[U], Awaitable[Tuple[B, List[LoggedValue]]]],
+    arg: U,
+) -> B:
+    """
+    Run async function f (that also returns values logged during its execution) with
+    result cached in `cache`. The cache key is determined by the task fingerprint
+    (see get_fingerprint) and the argument to f.
+
+    On a cache hit, f is not run and logged values are replayed from the cache.
+
+    Should be run inside the execute-task span of the task, and this span is marked
+    with a task.cache_hit attribute.
+    """
+    span = otel.trace.get_current_span()
+    loop = asyncio.get_running_loop()
+
+    key: CacheKey = await _compute_cache_key.remote(fingerprint, arg)  # type: ignore
+    cached_result: Optional[CachedResult] = await loop.run_in_executor(
+        None, cache.get, key
+    )
+
+    span.set_attribute("task.cache_hit", cached_result is not None)
+    span.set_attribute("task.cache_key", key)
+
+    if cached_result is None:
+        return_value, logged_values = await f(arg)
+        await loop.run_in_executor(
+            None, cache.put, key, CachedResult(return_value, logged_values)
+        )
+        return return_value
+
+    return replay_cached_result(cached_result)
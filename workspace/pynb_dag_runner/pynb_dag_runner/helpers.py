@@ -1,6 +1,16 @@
 import json
 from pathlib import Path
-from typing import Any, Generic, TypeVar, List, Iterable, Sequence, Tuple, Optional
+from typing import (
+    Any,
+    Dict,
+    Generic,
+    TypeVar,
+    List,
+    Iterable,
+    Sequence,
+    Tuple,
+    Optional,
+)
 
 A = TypeVar("A")
 
@@ -84,6 +94,73 @@ def one(xs: Iterable[A]) -> A:
     return xs_list[0]
 
 
+# --- graph helper functions ---
+
+
+def topological_sort(nodes: Sequence[A], edges: Sequence[Tuple[A, A]]) -> List[A]:
+    """
+    Return the nodes of a directed graph in topological order, ie., for every edge
+    (n1, n2) node n1 is listed before n2. Nodes without incoming edges are listed in
+    the same order as in `nodes`.
+
+    Raises ValueError if:
+     - `nodes` contains duplicates;
+     - an edge refers to a node not in `nodes` (dangling edge);
+     - the graph contains a cycle.
+    """
+    if len(set(nodes)) != len(nodes):
+        raise ValueError("topological_sort: duplicate nodes in input")
+
+    nr_parents: Dict[A, int] = {node: 0 for node in nodes}
+    child_nodes: Dict[A, List[A]] = {node: [] for node in nodes}
+
+    for n1, n2 in edges:
+        if n1 not in nr_parents or n2 not in nr_parents:
+            raise ValueError(f"topological_sort: edge {(n1, n2)} has unknown node")
+
+        nr_parents[n2] += 1
+        child_nodes[n1].append(n2)
+
+    result: List[A] = []
+    ready: List[A] = [node for node in nodes if nr_parents[node] == 0]
+    while len(ready) > 0:
+        node, *ready = ready
+        result.append(node)
+
+        for child_node in child_nodes[node]:
+            nr_parents[child_node] -= 1
+            if nr_parents[child_node] == 0:
+                ready.append(child_node)
+
+    if len(result) != len(nodes):
+        raise ValueError("topological_sort: graph contains a cycle")
+
+    return result
+
+
+def longest_path_weights(
+    nodes: Sequence[A], edges: Sequence[Tuple[A, A]], weights: Dict[A, float]
+) -> Dict[A, float]:
+    """
+    For every node n in a directed acyclic graph, return the maximum total weight of
+    a path starting from n (including the weight of n).
+
+    Eg. with node weights given by task durations, this is the critical path length
+    from the start of each task to the end of the DAG.
+    """
+    child_nodes: Dict[A, List[A]] = {node: [] for node in nodes}
+    for n1, n2 in edges:
+        child_nodes[n1].append(n2)
+
+    result: Dict[A, float] = {}
+    for node in reversed(topological_sort(nodes, edges)):
+        result[node] = weights[node] + max(
+            [result[child_node] for child_node in child_nodes[node]], default=0.0
+        )
+
+    return result
+
+
 # --- function helper functions ---
 
 
@@ -0,0 +1,281 @@
+import asyncio, concurrent.futures, contextvars, threading
+from typing import (
+    Any,
+    Awaitable,
+    Callable,
+    Dict,
+    Generator,
+    List,
+    Mapping,
+    Optional,
+    TypeVar,
+)
+
+#
+import ray
+import opentelemetry as otel
+import opentelemetry.propagate
+from opentelemetry.trace import StatusCode, Status  # type: ignore
+
+#
+from pynb_dag_runner.helpers import Try
+from pynb_dag_runner.opentelemetry_helpers import otel_add_baggage
+from pynb_dag_runner.ray_helpers import (
+    ResourceEscalation,
+    ResourceShape,
+    TaskTimeoutError,
+    _get_run_resources,
+)
+
+A = TypeVar("A")
+B = TypeVar("B")
+
+EXECUTOR_TYPES = ["thread", "process"]
+
+
+class LocalRef(Awaitable[A]):
+    """
+    Result of a method call on a LocalActorHandle (the local equivalent of a Ray
+    object ref). Can be awaited from any event loop, or waited for with get below.
+    """
+
+    def __init__(self, future: "concurrent.futures.Future[A]"):
+        self._future = future
+
+    def future(self) -> "concurrent.futures.Future[A]":
+        return self._future
+
+    def __await__(self) -> Generator[Any, None, A]:
+        return asyncio.wrap_future(self._future).__await__()
+
+
+class _LocalMethod:
+    def __init__(self, loop: asyncio.AbstractEventLoop, method: Callable):
+        self._loop = loop
+        self._method = method
+
+    def remote(self, *args, **kwargs) -> LocalRef:
+        result: concurrent.futures.Future = concurrent.futures.Future()
+
+        # Run method in the OpenTelemetry (and other contextvars) context of the
+        # caller, like Ray does for remote calls when tracing is enabled.
+        context: contextvars.Context = contextvars.copy_context()
+
+        def set_result(task: asyncio.Future) -> None:
+            if task.cancelled():
+                result.cancel()
+            elif task.exception() is not None:
+                result.set_exception(task.exception())  # type: ignore
+            else:
+                result.set_result(task.result())
+
+        def start_task() -> None:
+            task = context.run(
+                self._loop.create_task, self._method(*args, **kwargs)  # type: ignore
+            )
+            task.add_done_callback(set_result)
+
+        self._loop.call_soon_threadsafe(start_task)
+        return LocalRef(result)
+
+
+class LocalActorHandle:
+    """
+    Handle with the same interface as a Ray actor handle, but for an object whose
+    (async) methods are run in the event loop of a LocalExecutor. Eg.
+
+        handle.method.remote(*args)
+
+    schedules the coroutine obj.method(*args) in the event loop, and returns a
+    LocalRef to its result.
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, obj: Any):
+        self._loop = loop
+        self._obj = obj
+
+    def __getattr__(self, method_name: str) -> _LocalMethod:
+        return _LocalMethod(self._loop, getattr(self._obj, method_name))
+
+
+def get(refs: List[LocalRef], timeout_s: Optional[float] = None) -> List[Any]:
+    """
+    Wait for and return results of LocalRef:s (as ray.get). Raises
+    ray.exceptions.GetTimeoutError if the results are not ready within timeout_s
+    seconds.
+    """
+    futures = [ref.future() for ref in refs]
+    _, not_done = concurrent.futures.wait(futures, timeout=timeout_s)
+    if len(not_done) > 0:
+        raise ray.exceptions.GetTimeoutError(
+            f"{len(not_done)} result(s) not ready within timeout"
+        )
+    return [future.result() for future in futures]
+
+
+def _call_python_function(
+    f: Callable[[A], B], num_cpus: int, a: A, carrier: Dict[str, str]
+) -> Try[B]:
+    # Continue the OpenTelemetry context of the caller. The context is passed as
+    # a (W3C trace context and baggage) carrier, as Ray does for remote calls. So
+    # eg. baggage values are strings, as for functions run on Ray.
+    token = otel.context.attach(otel.propagate.extract(carrier))
+    tracer = otel.trace.get_tracer(__name__)  # type: ignore
+
+    try:
+        # Execute function in separate OpenTelemetry span (as ExecActor.call).
+        with tracer.start_as_current_span("call-python-function") as span:
+            span.set_attribute("task.num_cpus", num_cpus)
+            otel_add_baggage("task.num_cpus", num_cpus)
+
+            try:
+                result: Try[B] = Try(value=f(a), error=None)
+                span.set_status(Status(StatusCode.OK))
+            except BaseException as e:
+                result = Try(value=None, error=e)
+                span.record_exception(e)  # type: ignore
+                span.set_status(Status(StatusCode.ERROR, "Failure"))
+    finally:
+        otel.context.detach(token)
+
+    return result
+
+
+def _call_pickled_python_function(pickled_f_and_arg: bytes) -> Try:
+    """
+    Evaluate a (cloud)pickled function and argument in a process pool worker.
+    """
+    f, a = ray.cloudpickle.loads(pickled_f_and_arg)
+    try:
+        return Try(value=f(a), error=None)
+    except BaseException as e:
+        return Try(value=None, error=e)
+
+
+class LocalExecutor:
+    """
+    In-process executor for running small pipelines without Ray actors or tasks
+    (see local_executor in dag_runner.py).
+
+    The scheduler (DagScheduler) runs in an asyncio event loop in a background
+    thread, and Python functions are evaluated in a concurrent.futures thread pool
+    (executor_type="thread") or process pool (executor_type="process") with at most
+    `max_workers` workers.
+
+    Notes:
+    - Timeouts can not interrupt a running thread (or process pool worker). On
+      timeout the call is reported as failed, but the function keeps running in the
+      background and occupies a worker until it finishes.
+    - With executor_type="process", functions and arguments are serialized with
+      cloudpickle, and return values should be picklable. The call-python-function
+      span is then logged by the calling process, so OpenTelemetry baggage and any
+      values logged by the function are not available.
+    - num_cpus (and other resources) of tasks are only logged; concurrency is
+      limited by `max_workers`.
+    """
+
+    def __init__(self, max_workers: Optional[int] = None, executor_type="thread"):
+        if executor_type not in EXECUTOR_TYPES:
+            raise ValueError(f"Unknown executor type {executor_type}")
+
+        self.executor_type: str = executor_type
+        self._pool: concurrent.futures.Executor
+        if executor_type == "thread":
+            self._pool = concurrent.futures.ThreadPoolExecutor(max_workers)
+        else:
+            self._pool = concurrent.futures.ProcessPoolExecutor(max_workers)
+        self.max_workers: int = self._pool._max_workers  # type: ignore
+
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(
+            target=self._loop.run_forever, name="pynb-dag-runner-local", daemon=True
+        )
+        self._thread.start()
+
+    def actor(self, obj: Any) -> LocalActorHandle:
+        return LocalActorHandle(self._loop, obj)
+
+    def shutdown(self) -> None:
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._pool.shutdown(wait=False)
+
+    async def _call(self, f: Callable[[A], B], num_cpus: int, a: A) -> Try[B]:
+        loop = asyncio.get_running_loop()
+
+        if self.executor_type == "thread":
+            # run under the timeout-guard span (and with baggage set by the retry
+            # wrapper)
+            carrier: Dict[str, str] = {}
+            otel.propagate.inject(carrier)
+            return await loop.run_in_executor(
+                self._pool, _call_python_function, f, num_cpus, a, carrier
+            )
+
+        tracer = otel.trace.get_tracer(__name__)  # type: ignore
+        with tracer.start_as_current_span("call-python-function") as span:
+            span.set_attribute("task.num_cpus", num_cpus)
+            result: Try[B] = await loop.run_in_executor(
+                self._pool,
+                _call_pickled_python_function,
+                ray.cloudpickle.dumps((f, a)),
+            )
+            if result.is_success():
+                span.set_status(Status(StatusCode.OK))
+            else:
+                span.record_exception(result.error)  # type: ignore
+                span.set_status(Status(StatusCode.ERROR, "Failure"))
+
+        return result
+
+    def try_f_with_timeout_guard(
+        self,
+        f: Callable[[A], B],
+        timeout_s: Optional[float],
+        num_cpus: int,
+        resource_escalation: Optional[ResourceEscalation] = None,
+        memory: Optional[int] = None,
+        resources: Mapping[str, float] = {},
+        scheduling_strategy: Optional[str] = None,
+        thread_limits: Optional[Mapping[str, int]] = None,
+    ) -> Callable[[A], Awaitable[Try[B]]]:
+        """
+        Local version of try_f_with_timeout_guard in ray_helpers.py (with the same
+        OpenTelemetry spans). Requested (and escalated) resources are only logged,
+        and thread limits are not set (since workers are shared by all tasks).
+        """
+        shape = ResourceShape.create(
+            num_cpus, memory, resources, scheduling_strategy, thread_limits
+        )
+
+        async def timeout_guard(a: A) -> Try[B]:
+            tracer = otel.trace.get_tracer(__name__)  # type: ignore
+            with tracer.start_as_current_span("timeout-guard") as span:
+                span.set_attribute("task.timeout_s", timeout_s)
+                otel_add_baggage("task.timeout_s", timeout_s)
+                for k, v in shape.task_attributes().items():
+                    span.set_attribute(k, v)
+
+                run_timeout_s: Optional[float] = timeout_s
+                if resource_escalation is not None:
+                    run_timeout_s, _ = _get_run_resources(
+                        span, timeout_s, shape, resource_escalation
+                    )
+
+                call = asyncio.ensure_future(self._call(f, num_cpus, a))
+                try:
+                    done, _ = await asyncio.wait([call], timeout=run_timeout_s)
+                except asyncio.CancelledError:
+                    call.cancel()
+                    raise
+
+                if len(done) == 1:
+                    span.set_status(Status(StatusCode.OK))
+                    return call.result()
+                else:
+                    span.set_status(Status(StatusCode.ERROR, "Timeout"))
+                    call.cancel()
+
+                    return Try(value=None, error=TaskTimeoutError())
+
+        return timeout_guard
@@ -1,6 +1,7 @@
 from pathlib import Path
 import tempfile, os
-from typing import Any, Dict, Optional
+from contextlib import contextmanager
+from typing import Any, Dict, Mapping, Optional
 
 #
 import jupytext, papermill
@@ -38,6 +39,26 @@ def convert_ipynb_to_html(ipynb_notebook_content: str) -> str:
     return output
 
 
+@contextmanager
+def _updated_environ(env: Mapping[str, str]):
+    """
+    Context manager that sets environment variables in `env`, and restores the
+    previous values on exit.
+
+    Note: os.environ is shared by all threads of the process.
+    """
+    previous: Dict[str, Optional[str]] = {k: os.environ.get(k) for k in env}
+    os.environ.update(env)
+    try:
+        yield
+    finally:
+        for k, v in previous.items():
+            if v is None:
+                del os.environ[k]
+            else:
+                os.environ[k] = v
+
+
 class JupyterIpynbNotebook:
     # ipynb is the default file format used by Jupyter for storing notebooks.
     def __init__(self, filepath: Path):
@@ -49,11 +70,14 @@ class JupyterIpynbNotebook:
         output: "JupyterIpynbNotebook",
         cwd: Path,
         parameters: Dict[str, Any],
+        env: Mapping[str, str] = {},
     ):
         """
         Evaluate this Jupyter notebook and write evaluated notebook to output_path.
 
-        Evaluation and parameters are injected using papermill (BSD licensed)
+        Evaluation and parameters are injected using papermill (BSD licensed). The
+        kernel is started with environment variables `env` (eg. OMP_NUM_THREADS)
+        added to the environment of this process.
         """
         assert self.filepath.is_file()
         # assert not output.filepath.is_file()
@@ -63,19 +87,20 @@ class JupyterIpynbNotebook:
         # https://github.com/nteract/papermill/blob/main/papermill/cli.py
         # https://github.com/nteract/papermill/blob/main/papermill/execute.py
 
-        papermill.execute_notebook(
-            input_path=self.filepath,
-            output_path=output.filepath,
-            parameters=parameters,
-            request_save_on_cell_execute=True,
-            kernel_name="python",
-            language="python",
-            progress_bar=True,
-            stdout_file=None,
-            stderr_file=None,
-            log_output=True,
-            cwd=cwd,
-        )
+        with _updated_environ(env):
+            papermill.execute_notebook(
+                input_path=self.filepath,
+                output_path=output.filepath,
+                parameters=parameters,
+                request_save_on_cell_execute=True,
+                kernel_name="python",
+                language="python",
+                progress_bar=True,
+                stdout_file=None,
+                stderr_file=None,
+                log_output=True,
+                cwd=cwd,
+            )
 
     def to_html(self) -> Path:
         """
@@ -142,9 +167,16 @@ class JupytextNotebook:
 
         return output
 
-    def evaluate(self, output: JupyterIpynbNotebook, parameters: Dict[str, Any] = {}):
+    def evaluate(
+        self,
+        output: JupyterIpynbNotebook,
+        parameters: Dict[str, Any] = {},
+        env: Mapping[str, str] = {},
+    ):
         """
         Evaluate a Jupytext notebook, and inject provided parameters using Papermill.
+        The kernel is started with environment variables `env` (see
+        JupyterIpynbNotebook.evaluate).
 
         Exceptions thrown (eg from a cell) in the notebook are propagated and thrown by
         this function.
@@ -163,6 +195,7 @@ class JupytextNotebook:
                 # Run with jupytext notebook directory as current directory
                 cwd=self.filepath.parent,
                 parameters=parameters,
+                env=env,
             )
 
         except BaseException as e:
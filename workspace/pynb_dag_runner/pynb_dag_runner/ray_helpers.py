@@ -1,5 +1,17 @@
-import asyncio, random
-from typing import Any, TypeVar, Callable, List, Optional, Awaitable
+import asyncio, dataclasses, math, random, time, uuid
+from dataclasses import dataclass
+from typing import (
+    Any,
+    TypeVar,
+    Callable,
+    Dict,
+    List,
+    Mapping,
+    Optional,
+    Awaitable,
+    Set,
+    Tuple,
+)
 
 #
 import ray
@@ -8,7 +20,7 @@ from opentelemetry.trace import StatusCode, Status  # type: ignore
 
 #
 from pynb_dag_runner.helpers import Try
-from pynb_dag_runner.opentelemetry_helpers import otel_add_baggage
+from pynb_dag_runner.opentelemetry_helpers import AttributesDict, otel_add_baggage
 
 A = TypeVar("A")
 B = TypeVar("B")
@@ -89,41 +101,456 @@ class Future(Awaitable[A]):
         return lambda future: Future.map(future, f)
 
 
+class TaskTimeoutError(Exception):
+    """
+    Error returned (as a failed Try) when a function call does not finish within its
+    timeout limit (see try_f_with_timeout_guard).
+    """
+
+    def __init__(
+        self, message="Timeout error: execution did not finish within timeout limit"
+    ):
+        super().__init__(message)
+
+
+@ray.remote(num_cpus=0)
+class ExecActor(RayMypy):
+    """
+    Worker actor for evaluating functions (see _try_eval_f_async_wrapper below).
+
+    Actors are started and pooled by the ExecActorPool actor, so one actor may
+    evaluate many functions. Resources (see ResourceShape) are set when the actor is
+    started.
+    """
+
+    def ready(self) -> None:
+        pass
+
+    def call(self, f, success_handler, error_handler, num_cpus, *args):
+        tracer = otel.trace.get_tracer(__name__)  # type: ignore
+
+        # Execute function in separate OpenTelemetry span.
+        with tracer.start_as_current_span("call-python-function") as span:
+
+            span.set_attribute("task.num_cpus", num_cpus)
+            otel_add_baggage("task.num_cpus", num_cpus)
+
+            try:
+                result = success_handler(f(*args))
+                span.set_status(Status(StatusCode.OK))
+
+            except BaseException as e:
+                result = error_handler(e)
+                span.record_exception(e)
+                span.set_status(Status(StatusCode.ERROR, "Failure"))
+
+        return result
+
+
+SCHEDULING_STRATEGIES = ["DEFAULT", "SPREAD"]
+
+# Environment variables limiting the size of thread pools started by numerical
+# libraries (OpenMP, MKL, OpenBLAS, BLIS, Accelerate, numexpr). These should be set
+# before the libraries are imported, so they are set when a process is started.
+THREAD_LIMIT_ENV_VARS = [
+    "OMP_NUM_THREADS",
+    "MKL_NUM_THREADS",
+    "OPENBLAS_NUM_THREADS",
+    "BLIS_NUM_THREADS",
+    "VECLIB_MAXIMUM_THREADS",
+    "NUMEXPR_NUM_THREADS",
+]
+
+
+def default_thread_limits(num_cpus: int) -> Dict[str, int]:
+    """
+    Return default thread limits for a function using `num_cpus` CPUs. Otherwise
+    libraries like NumPy start one thread per core of the machine, and functions
+    running side by side oversubscribe the CPUs.
+    """
+    return {k: max(1, num_cpus) for k in THREAD_LIMIT_ENV_VARS}
+
+
+@dataclass(frozen=True)
+class ResourceShape:
+    """
+    Resources requested by an ExecActor:
+
+     - num_cpus: number of CPUs;
+     - memory: memory in bytes (None = no memory requested). Ray then only starts
+       actors on nodes with enough memory not requested by other tasks/actors;
+     - resources: custom Ray resources, eg. {"GPU": 1}, as sorted tuple of
+       (resource name, amount) pairs;
+     - scheduling_strategy: Ray scheduling strategy for starting the actor. With
+       "SPREAD", actors are spread over the nodes of the cluster (eg. to avoid
+       packing memory-heavy tasks on one node). None = Ray default;
+     - thread_limits: values for thread limit environment variables (eg.
+       OMP_NUM_THREADS) set in the actor process, as sorted tuple of (variable,
+       value) pairs. None = default_thread_limits(num_cpus).
+    """
+
+    num_cpus: int
+    memory: Optional[int] = None
+    resources: Tuple[Tuple[str, float], ...] = ()
+    scheduling_strategy: Optional[str] = None
+    thread_limits: Optional[Tuple[Tuple[str, int], ...]] = None
+
+    def __post_init__(self):
+        if self.memory is not None and self.memory <= 0:
+            raise ValueError("memory should be None or a positive number of bytes")
+
+        if (
+            self.scheduling_strategy is not None
+            and self.scheduling_strategy not in SCHEDULING_STRATEGIES
+        ):
+            raise ValueError(f"Unknown scheduling strategy {self.scheduling_strategy}")
+
+    @staticmethod
+    def create(
+        num_cpus: int,
+        memory: Optional[int] = None,
+        resources: Mapping[str, float] = {},
+        scheduling_strategy: Optional[str] = None,
+        thread_limits: Optional[Mapping[str, int]] = None,
+    ) -> "ResourceShape":
+        return ResourceShape(
+            num_cpus=num_cpus,
+            memory=memory,
+            resources=tuple(sorted(resources.items())),
+            scheduling_strategy=scheduling_strategy,
+            thread_limits=(
+                None if thread_limits is None else tuple(sorted(thread_limits.items()))
+            ),
+        )
+
+    def get_thread_limits(self) -> Dict[str, int]:
+        if self.thread_limits is None:
+            return default_thread_limits(self.num_cpus)
+        return dict(self.thread_limits)
+
+    def actor_options(self) -> Dict[str, Any]:
+        """
+        Return options for starting an actor with these resources (with .options).
+        """
+        return {
+            "num_cpus": self.num_cpus,
+            **({} if self.memory is None else {"memory": self.memory}),
+            **({} if len(self.resources) == 0 else {"resources": dict(self.resources)}),
+            **(
+                {}
+                if self.scheduling_strategy is None
+                else {"scheduling_strategy": self.scheduling_strategy}
+            ),
+            **(
+                {}
+                if len(self.get_thread_limits()) == 0
+                else {"runtime_env": {"env_vars": self.thread_limits_env()}}
+            ),
+        }
+
+    def thread_limits_env(self) -> Dict[str, str]:
+        return {k: str(v) for k, v in self.get_thread_limits().items()}
+
+    def task_attributes(self) -> AttributesDict:
+        """
+        Return requested resources (except num_cpus, that is logged by ExecActor) as
+        task.* attributes. Resources that are not requested are not included.
+        """
+        return {
+            **({} if self.memory is None else {"task.memory": self.memory}),
+            **{f"task.resources.{k}": v for k, v in self.resources},
+            **(
+                {}
+                if self.scheduling_strategy is None
+                else {"task.scheduling_strategy": self.scheduling_strategy}
+            ),
+        }
+
+
+LeaseId = str
+
+
+@ray.remote(num_cpus=0)
+class ExecActorPool(RayMypy):
+    """
+    Pool of started ExecActor:s that are leased for each function call (see
+    _try_eval_f_async_wrapper below). This way function calls do not need to wait for
+    a new Ray worker process to start and to import modules.
+
+    Actors are pooled by resource shape (see ResourceShape), and are returned to the
+    pool after each call. Actors only leave the pool when they are killed (ie., when a
+    call times out, or a lessee is cancelled, see terminate_leases).
+
+    Since idle actors hold their resources:
+     - idle actors are killed after `max_idle_s` seconds;
+     - when no idle actor with the requested resources is available, idle actors
+       with other resources are killed before a new actor is started.
+    """
+
+    def __init__(self, max_idle_s: float = 10.0):
+        self._max_idle_s = max_idle_s
+
+        # shape -> list of (time when returned to pool, actor)
+        self._idle: Dict[ResourceShape, List[Tuple[float, Any]]] = {}
+        # shape -> leases waiting for an actor to be returned
+        self._waiters: Dict[ResourceShape, List[asyncio.Future]] = {}
+        # lease_id -> (lessee, shape, actor)
+        self._leases: Dict[LeaseId, Tuple[Optional[str], ResourceShape, Any]] = {}
+        self._terminated_lessees: Set[str] = set()
+        self._evict_loop: Optional[asyncio.Future] = None
+
+    def _return_to_pool(self, shape: ResourceShape, actor: Any) -> None:
+        # hand over actor directly to waiting lease (if any)
+        for waiter in self._waiters.get(shape, []):
+            if not waiter.done():
+                self._waiters[shape].remove(waiter)
+                waiter.set_result(actor)
+                return
+
+        self._idle.setdefault(shape, []).append((time.monotonic(), actor))
+
+    def _kill_idle(self, keep: Callable[[ResourceShape, float], bool]) -> None:
+        for shape, idle_actors in self._idle.items():
+            self._idle[shape] = []
+            for returned_ts, actor in idle_actors:
+                if keep(shape, returned_ts):
+                    self._idle[shape].append((returned_ts, actor))
+                else:
+                    ray.kill(actor)
+
+    async def _evict_idle_actors(self) -> None:
+        while True:
+            await asyncio.sleep(self._max_idle_s / 2)
+            now: float = time.monotonic()
+            self._kill_idle(lambda _, ts: now - ts < self._max_idle_s)
+
+    async def lease(
+        self, shape: ResourceShape, lessee: Optional[str]
+    ) -> Tuple[LeaseId, Any, bool]:
+        """
+        Lease an actor with resources `shape`. Returns (lease_id, actor, pool_hit),
+        where pool_hit is True if an idle actor was available in the pool.
+
+        `lessee` is an (optional) id of the Ray task leasing the actor.
+        """
+        if self._evict_loop is None:
+            self._evict_loop = asyncio.ensure_future(self._evict_idle_actors())
+
+        pool_hit: bool = len(self._idle.get(shape, [])) > 0
+        if pool_hit:
+            _, actor = self._idle[shape].pop()
+        else:
+            # free resources held by idle actors of other shapes
+            self._kill_idle(lambda idle_shape, _: idle_shape == shape)
+
+            # Start new actor, but use any actor returned to pool before it is ready
+            waiter: asyncio.Future = asyncio.get_running_loop().create_future()
+            self._waiters.setdefault(shape, []).append(waiter)
+
+            new_actor = ExecActor.options(  # type: ignore
+                **shape.actor_options()
+            ).remote()
+            new_actor_ready = asyncio.ensure_future(new_actor.ready.remote())
+            await asyncio.wait(
+                [waiter, new_actor_ready], return_when=asyncio.FIRST_COMPLETED
+            )
+
+            if waiter.done():
+                actor = waiter.result()
+                if new_actor_ready.done():
+                    self._return_to_pool(shape, new_actor)
+                else:
+                    new_actor_ready.cancel()
+                    ray.kill(new_actor)
+            else:
+                self._waiters[shape].remove(waiter)
+                actor = new_actor
+
+        if lessee is not None and lessee in self._terminated_lessees:
+            self._return_to_pool(shape, actor)
+            raise Exception(f"Lessee {lessee} has been terminated")
+
+        lease_id: LeaseId = uuid.uuid4().hex
+        self._leases[lease_id] = (lessee, shape, actor)
+        return lease_id, actor, pool_hit
+
+    def release(self, lease_id: LeaseId, actor_killed: bool) -> None:
+        """
+        End lease, and return actor to the pool unless it has been killed.
+        """
+        _, shape, actor = self._leases.pop(lease_id)
+        if not actor_killed:
+            self._return_to_pool(shape, actor)
+
+    def terminate_leases(self, lessee: str) -> None:
+        """
+        Kill all actors leased by a (cancelled) Ray task.
+        """
+        self._terminated_lessees.add(lessee)
+
+        for lease_id, (lease_lessee, _, actor) in list(self._leases.items()):
+            if lease_lessee == lessee:
+                del self._leases[lease_id]
+                ray.kill(actor)
+
+
+EXEC_ACTOR_POOL_NAME = "pynb-dag-runner-exec-actor-pool"
+_created_exec_actor_pool: Any = None
+
+
+def get_exec_actor_pool():
+    """
+    Return handle to the ExecActorPool actor shared by all tasks in the Ray
+    namespace. The actor is created on first use.
+
+    Note: the pool is owned by the process that creates it (and pooled actors are
+    terminated with it). So the pool should be created by a long-lived process, like
+    the driver or the scheduler actor (see dag_runner.py).
+    """
+    global _created_exec_actor_pool
+
+    try:
+        return ray.get_actor(EXEC_ACTOR_POOL_NAME)
+    except ValueError:
+        pass
+
+    try:
+        # Keep a handle to the created pool (see _get_dag_scheduler in dag_runner.py)
+        _created_exec_actor_pool = ExecActorPool.options(  # type: ignore
+            name=EXEC_ACTOR_POOL_NAME
+        ).remote()
+        return _created_exec_actor_pool
+    except ValueError:
+        # pool was created by another process after the first lookup
+        return ray.get_actor(EXEC_ACTOR_POOL_NAME)
+
+
+@dataclass(frozen=True)
+class ResourceEscalation:
+    """
+    Schedule for increasing the resources of a function call when it is retried
+    (eg. when a call fails with a timeout on a large input, a retry with the same
+    timeout would likely fail again).
+
+    For retry number retry_nr (0 = first call), the call is run with
+
+          timeout_s * timeout_multiplier ** retry_nr    (at most max_timeout_s)
+          num_cpus * num_cpus_multiplier ** retry_nr    (rounded up, at most
+                                                         max_num_cpus)
+          memory * memory_multiplier ** retry_nr        (at most max_memory)
+
+    Eg. ResourceEscalation(timeout_multiplier=2.0, memory_multiplier=2.0) doubles
+    the timeout and requested memory on every retry. Note that max_num_cpus should be set so that a call fits on one node (or
+    the call will wait indefinitely for an ExecActor to start).
+    """
+
+    timeout_multiplier: float = 1.0
+    num_cpus_multiplier: float = 1.0
+    max_timeout_s: Optional[float] = None
+    max_num_cpus: Optional[int] = None
+    memory_multiplier: float = 1.0
+    max_memory: Optional[int] = None
+
+    def __post_init__(self):
+        if (
+            min(
+                self.timeout_multiplier,
+                self.num_cpus_multiplier,
+                self.memory_multiplier,
+            )
+            < 1.0
+        ):
+            raise ValueError("Resource multipliers should be at least 1.0")
+
+    def get_timeout_s(
+        self, timeout_s: Optional[float], retry_nr: int
+    ) -> Optional[float]:
+        if timeout_s is None:
+            return None
+
+        result: float = timeout_s * self.timeout_multiplier**retry_nr
+        if self.max_timeout_s is not None:
+            result = min(result, max(timeout_s, self.max_timeout_s))
+        return result
+
+    def get_num_cpus(self, num_cpus: int, retry_nr: int) -> int:
+        result: int = math.ceil(num_cpus * self.num_cpus_multiplier**retry_nr)
+        if self.max_num_cpus is not None:
+            result = min(result, max(num_cpus, self.max_num_cpus))
+        return result
+
+    def get_memory(self, memory: Optional[int], retry_nr: int) -> Optional[int]:
+        if memory is None:
+            return None
+
+        result: int = math.ceil(memory * self.memory_multiplier**retry_nr)
+        if self.max_memory is not None:
+            result = min(result, max(memory, self.max_memory))
+        return result
+
+
+def _get_run_resources(
+    span,
+    timeout_s: Optional[float],
+    shape: ResourceShape,
+    escalation: ResourceEscalation,
+) -> Tuple[Optional[float], ResourceShape]:
+    """
+    Return (timeout_s, shape) for the current call after escalation, and log
+    these as run.timeout_s, run.num_cpus and run.memory (if memory is requested)
+    attributes (and baggage).
+
+    The retry number of the call is read from the run.retry_nr baggage (set by
+    retry_wrapper_ot, and a string if propagated by Ray).
+    """
+    retry_nr: int = int(otel.baggage.get_baggage("run.retry_nr") or 0)  # type: ignore
+
+    run_timeout_s: Optional[float] = escalation.get_timeout_s(timeout_s, retry_nr)
+    run_shape: ResourceShape = dataclasses.replace(
+        shape,
+        num_cpus=escalation.get_num_cpus(shape.num_cpus, retry_nr),
+        memory=escalation.get_memory(shape.memory, retry_nr),
+    )
+
+    run_attributes: AttributesDict = {
+        "run.timeout_s": run_timeout_s,
+        "run.num_cpus": run_shape.num_cpus,
+        **({} if run_shape.memory is None else {"run.memory": run_shape.memory}),
+    }
+    for k, v in run_attributes.items():
+        span.set_attribute(k, v)
+        otel_add_baggage(k, v)
+
+    return run_timeout_s, run_shape
+
+
 def _try_eval_f_async_wrapper(
     f: Callable[[A], B],
     timeout_s: Optional[float],
     success_handler: Callable[[B], C],
     error_handler: Callable[[Exception], C],
-    num_cpus: int = 0,
+    shape: ResourceShape = ResourceShape(num_cpus=0),
+    resource_escalation: Optional[ResourceEscalation] = None,
 ) -> Callable[[A], Awaitable[C]]:
     """
     Lift a function f: A -> B and result/error handlers into a function operating
     on futures Future[A] -> Future[C].
 
-    The lifted function logs to OpenTelemetry
-    """
-
-    @ray.remote(num_cpus=num_cpus)
-    class ExecActor:
-        def call(self, *args):
-            tracer = otel.trace.get_tracer(__name__)  # type: ignore
-
-            # Execute function in separate OpenTelemetry span.
-            with tracer.start_as_current_span("call-python-function") as span:
+    The function is evaluated in an ExecActor with resources `shape` leased from the
+    ExecActorPool. Pool hit/miss and the time waited for the lease are logged to the
+    timeout-guard span, together with the requested resources (as task.* attributes,
+    see ResourceShape.task_attributes).
 
-                span.set_attribute("task.num_cpus", num_cpus)
-                otel_add_baggage("task.num_cpus", num_cpus)
-
-                try:
-                    result = success_handler(f(*args))
-                    span.set_status(Status(StatusCode.OK))
+    If a `resource_escalation` is provided, the timeout and resources used for a call
+    depend on its retry number (see ResourceEscalation). The task.* attributes are
+    then the values configured for the task, and the values used for the call are
+    logged as run.timeout_s, run.num_cpus and run.memory.
 
-                except BaseException as e:
-                    result = error_handler(e)
-                    span.record_exception(e)
-                    span.set_status(Status(StatusCode.ERROR, "Failure"))
+    Thread limit environment variables set in the ExecActor (see
+    ResourceShape.thread_limits) are logged as run.env.<variable> attributes.
 
-            return result
+    The lifted function logs to OpenTelemetry
+    """
 
     async def timeout_guard(a: A) -> C:
         """
@@ -137,41 +564,87 @@ def _try_eval_f_async_wrapper(
         with tracer.start_as_current_span("timeout-guard") as span:
             span.set_attribute("task.timeout_s", timeout_s)
             otel_add_baggage("task.timeout_s", timeout_s)
+            for k, v in shape.task_attributes().items():
+                span.set_attribute(k, v)
 
-            work_actor = ExecActor.remote()  # type: ignore
-            future = work_actor.call.remote(a)
+            run_timeout_s, run_shape = timeout_s, shape
+            if resource_escalation is not None:
+                run_timeout_s, run_shape = _get_run_resources(
+                    span, timeout_s, shape, resource_escalation
+                )
+            for k, v in run_shape.thread_limits_env().items():
+                span.set_attribute(f"run.env.{k}", v)
+
+            # Note: the timeout does not include the time waited for the lease (eg.
+            # for an actor to start, or for CPUs to become available)
+            lease_start_ts: float = time.monotonic()
+            pool = get_exec_actor_pool()
+            lease_id, work_actor, pool_hit = await pool.lease.remote(
+                run_shape, ray.get_runtime_context().get_task_id()
+            )
+            lease_wait_s: float = time.monotonic() - lease_start_ts
 
-            refs_done, refs_not_done = ray.wait(
-                [future], num_returns=1, timeout=timeout_s
+            span.set_attribute("exec_actor_pool.hit", pool_hit)
+            span.set_attribute("exec_actor_pool.lease_wait_s", lease_wait_s)
+
+            future = work_actor.call.remote(
+                f, success_handler, error_handler, shape.num_cpus, a
             )
-            assert len(refs_done) + len(refs_not_done) == 1
-            if len(refs_done) == 1:
-                assert refs_done == [future]
+
+            # Wait for the result without blocking the event loop (as ray.wait would
+            # do), so one event loop can supervise many concurrent calls.
+            result_future: asyncio.Future = asyncio.wrap_future(future.future())
+            try:
+                done, _ = await asyncio.wait([result_future], timeout=run_timeout_s)
+            except asyncio.CancelledError:
+                ray.kill(work_actor)
+                await pool.release.remote(lease_id, actor_killed=True)
+                raise
+
+            if len(done) == 1:
                 span.set_status(Status(StatusCode.OK))
-                return await future
+                try:
+                    result = result_future.result()
+                except BaseException:
+                    # actor has died
+                    await pool.release.remote(lease_id, actor_killed=True)
+                    raise
+
+                await pool.release.remote(lease_id, actor_killed=False)
+                return result
             else:
-                assert refs_not_done == [future]
                 span.set_status(Status(StatusCode.ERROR, "Timeout"))
 
                 # https://docs.ray.io/en/latest/actors.html#terminating-actors
                 ray.kill(work_actor)
+                await pool.release.remote(lease_id, actor_killed=True)
 
-                return error_handler(
-                    Exception(
-                        "Timeout error: execution did not finish within timeout limit"
-                    )
-                )
+                return error_handler(TaskTimeoutError())
 
     return timeout_guard
 
 
 def try_f_with_timeout_guard(
-    f: Callable[[A], B], timeout_s: Optional[float], num_cpus: int
+    f: Callable[[A], B],
+    timeout_s: Optional[float],
+    num_cpus: int,
+    resource_escalation: Optional[ResourceEscalation] = None,
+    memory: Optional[int] = None,
+    resources: Mapping[str, float] = {},
+    scheduling_strategy: Optional[str] = None,
+    thread_limits: Optional[Mapping[str, int]] = None,
 ) -> Callable[[A], Awaitable[Try[B]]]:
     return _try_eval_f_async_wrapper(
         f=f,
         timeout_s=timeout_s,
-        num_cpus=num_cpus,
+        shape=ResourceShape.create(
+            num_cpus=num_cpus,
+            memory=memory,
+            resources=resources,
+            scheduling_strategy=scheduling_strategy,
+            thread_limits=thread_limits,
+        ),
+        resource_escalation=resource_escalation,
         success_handler=lambda f_result: Try(value=f_result, error=None),
         error_handler=lambda f_exception: Try(value=None, error=f_exception),
     )
@@ -180,19 +653,133 @@ def try_f_with_timeout_guard(
 RetryCount = int
 
 
+@ray.remote(num_cpus=0)
+class _RetryBudgetActor(RayMypy):
+    def __init__(self, max_nr_retries: int):
+        self._nr_retries_left = max_nr_retries
+
+    def try_acquire(self) -> bool:
+        if self._nr_retries_left <= 0:
+            return False
+
+        self._nr_retries_left -= 1
+        return True
+
+
+class RetryBudget:
+    """
+    Upper limit on the total number of retries of all tasks using the budget (eg.,
+    all tasks in a pipeline, see RetryPolicy below). This limits the number of calls
+    made when many tasks fail, eg. when a shared resource is down.
+
+    The remaining budget is kept in a Ray actor, so one budget can be shared by tasks
+    running in different processes.
+    """
+
+    def __init__(self, max_nr_retries: int):
+        if max_nr_retries < 0:
+            raise ValueError("max_nr_retries should be a non-negative integer")
+
+        self.max_nr_retries = max_nr_retries
+        self._actor = _RetryBudgetActor.remote(max_nr_retries)  # type: ignore
+
+    async def try_acquire(self) -> bool:
+        """
+        Use one retry from the budget. Returns False if the budget is used up.
+        """
+        return await self._actor.try_acquire.remote()
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    """
+    Determines if, and after what delay, a failed call is retried by retry_wrapper_ot.
+
+    - Retry number k (k = 1, 2, ...) is started after a delay of
+
+          min(max_backoff_s, backoff_s * backoff_multiplier ** (k - 1))
+
+      seconds (exponential backoff). With jitter > 0, the delay is multiplied by a
+      random factor in [1 - jitter, 1]. So jitter=1.0 gives "full jitter", and spreads
+      out retries of tasks that failed at the same time.
+
+    - If `retry_on` is set, a call is only retried when retry_on(error) is True. Eg.
+      `retry_on=lambda e: isinstance(e, ConnectionError)` does not retry errors that
+      can not succeed on a retry, like a ValueError from invalid input.
+
+    - If retry_on_timeout=False, calls that fail with a TaskTimeoutError are not
+      retried.
+
+    - If a `budget` is set, every retry uses one retry from the budget, and no more
+      retries are done when the budget is used up.
+
+    The default policy retries all errors immediately.
+    """
+
+    backoff_s: float = 0.0
+    backoff_multiplier: float = 2.0
+    max_backoff_s: float = 300.0
+    jitter: float = 0.0
+    retry_on: Optional[Callable[[BaseException], bool]] = None
+    retry_on_timeout: bool = True
+    budget: Optional[RetryBudget] = None
+
+    def __post_init__(self):
+        if self.backoff_s < 0 or self.max_backoff_s < 0:
+            raise ValueError("backoff_s and max_backoff_s should be non-negative")
+
+        if not 0.0 <= self.jitter <= 1.0:
+            raise ValueError("jitter should be in the range [0, 1]")
+
+    def get_delay_s(self, retry_nr: int) -> float:
+        """
+        Return delay (in seconds) before starting retry number retry_nr (>= 1).
+        """
+        assert retry_nr >= 1
+        delay_s: float = min(
+            self.max_backoff_s,
+            self.backoff_s * self.backoff_multiplier ** (retry_nr - 1),
+        )
+        return delay_s * random.uniform(1.0 - self.jitter, 1.0)
+
+    async def get_stop_reason(self, error: BaseException) -> Optional[str]:
+        """
+        Return reason for not retrying a call that failed with `error`, or None if the
+        call should be retried.
+
+        Note: if the call should be retried, this uses one retry from the budget.
+        """
+        if isinstance(error, TaskTimeoutError) and not self.retry_on_timeout:
+            return "timeout"
+
+        if self.retry_on is not None and not self.retry_on(error):
+            return "error_not_retryable"
+
+        if self.budget is not None and not await self.budget.try_acquire():
+            return "retry_budget_exhausted"
+
+        return None
+
+
 def retry_wrapper_ot(
     f: Callable[[A], Awaitable[Try[B]]],
     max_nr_retries: int,
+    attributes: AttributesDict = {},
+    retry_policy: RetryPolicy = RetryPolicy(),
 ) -> Callable[[A], Awaitable[Try[B]]]:
     """
     Retry wrapper for async function A -> Try[B].
 
     Returns async function with same signature that executes input function at most
     `max_nr_retries` times, and returns either the first successful return value, or
-    the last return value (which may be success or failure).
+    the last return value (which may be success or failure). Failed calls are retried
+    (or not) as determined by `retry_policy`.
 
     Execution is logged to OpenTelemetry spans and iteration parameters are set as
-    baggage.
+    baggage. Optional `attributes` are set on every retry-call span. For a failed call,
+    the retry decision is logged as attributes run.retry_decision ("retry" or "stop"),
+    run.retry_reason (if stopped) and run.retry_delay_s (if retried) of its
+    retry-call span.
     """
     assert max_nr_retries > 0
 
@@ -206,6 +793,8 @@ def retry_wrapper_ot(
                 with tracer.start_as_current_span("retry-call") as iteration_span:
                     otel_add_baggage("run.retry_nr", retry_nr)
                     iteration_span.set_attribute("run.retry_nr", retry_nr)
+                    for k, v in attributes.items():
+                        iteration_span.set_attribute(k, v)
 
                     try_b: Try[B] = await f(a)
 
@@ -221,12 +810,37 @@ def retry_wrapper_ot(
                             )
                         )
 
-            top_span.set_status(
-                Status(
-                    StatusCode.ERROR,
-                    f"Function called retried {max_nr_retries} times; all failed!",
+                    stop_reason: Optional[str]
+                    if retry_nr + 1 == max_nr_retries:
+                        stop_reason = "max_nr_retries"
+                    else:
+                        assert try_b.error is not None
+                        stop_reason = await retry_policy.get_stop_reason(try_b.error)
+
+                    if stop_reason is None:
+                        delay_s: float = retry_policy.get_delay_s(retry_nr + 1)
+                        iteration_span.set_attribute("run.retry_decision", "retry")
+                        iteration_span.set_attribute("run.retry_delay_s", delay_s)
+                    else:
+                        iteration_span.set_attribute("run.retry_decision", "stop")
+                        iteration_span.set_attribute("run.retry_reason", stop_reason)
+
+                if stop_reason is not None:
+                    break
+
+                # wait outside the retry-call span (and without blocking event loop)
+                await asyncio.sleep(delay_s)
+
+            if stop_reason == "max_nr_retries":
+                description = (
+                    f"Function called retried {max_nr_retries} times; all failed!"
                 )
-            )
+            else:
+                description = (
+                    f"Function failed after {retry_nr + 1} call(s); "
+                    f"not retried ({stop_reason})"
+                )
+            top_span.set_status(Status(StatusCode.ERROR, description))
             return try_b
 
     return do_retries
@@ -1,6 +1,6 @@
 import base64, json, tempfile, os
 from pathlib import Path
-from typing import Any, Callable, Dict, Optional, Mapping, Union
+from typing import Any, Callable, Dict, List, Optional, Mapping, Tuple, Union
 from dataclasses import dataclass
 
 #
@@ -142,6 +142,67 @@ def _log_named_value(
         traceparent=traceparent,
     )
 
+    # record logged value if logging is done inside _record_logged_values (below)
+    record_filepath: Optional[str] = os.environ.get(_RECORD_LOGGED_VALUES_ENV)
+    if record_filepath is not None:
+        record: Dict[str, Any] = {
+            "name": name,
+            "content": SerializedData.encode(content).__dict__,
+            "content_type": content_type,
+            "is_file": is_file,
+        }
+        with open(record_filepath, "a") as f:
+            f.write(json.dumps(record) + "\n")
+
+
+# --- record/replay logged values (used for caching task results) ---
+
+LoggedValue = Dict[str, Any]
+
+_RECORD_LOGGED_VALUES_ENV = "PYNB_DAG_RUNNER_RECORD_LOGGED_VALUES_FILE"
+
+
+def _record_logged_values(f: Callable[..., Any]) -> Callable[..., Tuple[Any, Any]]:
+    """
+    Wrap function f so that it also returns a list of all values logged with
+    _log_named_value during its execution.
+
+    Logged values are recorded to a file given by an environment variable, so values
+    logged from subprocesses (eg. from a Jupyter kernel when running a notebook) are
+    also recorded.
+
+    Note: f is assumed to run in its own process (eg. in a Ray ExecActor).
+    """
+
+    def wrapped_f(*args):
+        with tempfile.TemporaryDirectory(prefix="pydar-temp") as tmp_dir:
+            record_filepath: Path = Path(tmp_dir) / "logged-values.jsonl"
+            record_filepath.touch()
+
+            os.environ[_RECORD_LOGGED_VALUES_ENV] = str(record_filepath)
+            try:
+                result = f(*args)
+            finally:
+                del os.environ[_RECORD_LOGGED_VALUES_ENV]
+
+            logged_values: List[LoggedValue] = []
+            for line in record_filepath.read_text().splitlines():
+                record: Dict[str, Any] = json.loads(line)
+                logged_values.append(
+                    {**record, "content": SerializedData(**record["content"]).decode()}
+                )
+            return result, logged_values
+
+    return wrapped_f
+
+
+def _replay_logged_values(logged_values: List[LoggedValue]):
+    """
+    Log values recorded by _record_logged_values (in current span context).
+    """
+    for logged_value in logged_values:
+        _log_named_value(**logged_value)
+
 
 def _read_logged_serialized_data(spans: Spans, filter_name: str):
     """
@@ -1,4 +1,4 @@
-from typing import Mapping
+from typing import Mapping, Optional
 from pathlib import Path
 
 #
@@ -9,7 +9,13 @@ from opentelemetry.trace.propagation.tracecontext import (
 
 #
 from pynb_dag_runner.core.dag_runner import task_from_python_function
+from pynb_dag_runner.core.task_cache import TaskCache
 from pynb_dag_runner.opentelemetry_helpers import AttributesDict
+from pynb_dag_runner.ray_helpers import (
+    ResourceEscalation,
+    ResourceShape,
+    RetryPolicy,
+)
 from pynb_dag_runner.tasks.task_opentelemetry_logging import _log_named_value
 
 #
@@ -42,7 +48,31 @@ def make_jupytext_task_ot(
     max_nr_retries: int = 1,
     num_cpus: int = 1,
     parameters: AttributesDict = {},
+    cache: Optional[TaskCache] = None,
+    retry_policy: RetryPolicy = RetryPolicy(),
+    resource_escalation: Optional[ResourceEscalation] = None,
+    memory: Optional[int] = None,
+    resources: Mapping[str, float] = {},
+    scheduling_strategy: Optional[str] = None,
+    thread_limits: Optional[Mapping[str, int]] = None,
 ):
+    """
+    Create a task that evaluates a Jupytext notebook with parameters.
+
+    The task fingerprint depends on the notebook source and parameters. If a `cache`
+    is provided, notebook evaluation is skipped when the cache contains a result for
+    the same fingerprint and upstream return values (see task_from_python_function).
+
+    Failed notebook runs are retried as determined by `retry_policy`, and with
+    increased timeout and/or CPUs if a `resource_escalation` is provided. The values
+    used for a run are available to the notebook as P["run.timeout_s"] and
+    P["run.num_cpus"].
+
+    Resources for evaluating the notebook can be requested with `num_cpus`, `memory`
+    (in bytes), `resources` and `scheduling_strategy` (see task_from_python_function).
+    The notebook kernel is started with the same thread limits (eg. OMP_NUM_THREADS)
+    as the task, by default based on the number of CPUs used by the run.
+    """
     # Determine task run-attributes (except baggage which can only be determined at
     # run time).
     run_attributes: AttributesDict = {
@@ -56,6 +86,12 @@ def make_jupytext_task_ot(
 
         baggage = otel.baggage.get_all()
 
+        # number of CPUs used by this run (may be escalated for retries)
+        run_shape = ResourceShape.create(
+            num_cpus=int(baggage.get("run.num_cpus", num_cpus)),  # type: ignore
+            thread_limits=thread_limits,
+        )
+
         try:
             notebook.evaluate(
                 output=evaluated_notebook,
@@ -66,6 +102,7 @@ def make_jupytext_task_ot(
                         "_opentelemetry_traceparent": _get_traceparent(),
                     }
                 },
+                env=run_shape.thread_limits_env(),
             )
 
         except BaseException as e:
@@ -87,4 +124,12 @@ def make_jupytext_task_ot(
         timeout_s=timeout_s,
         attributes=run_attributes,
         task_type="jupytext",
+        cache=cache,
+        cache_key_data=notebook.filepath.read_text(),
+        retry_policy=retry_policy,
+        resource_escalation=resource_escalation,
+        memory=memory,
+        resources=resources,
+        scheduling_strategy=scheduling_strategy,
+        thread_limits=thread_limits,
     )
@@ -15,6 +15,9 @@ from pynb_dag_runner.opentelemetry_task_span_parser import (
 def _status_summary(span_dict) -> str:
     if span_dict["status"]["status_code"] == "OK":
         return "OK"
+    elif span_dict["attributes"].get("task.cancelled", False):
+        # task cancelled by the failure policy of the pipeline (see run_dag)
+        return "CANCELLED"
     else:
         return "FAILED"
 
@@ -112,6 +115,24 @@ def render_seconds(us_range) -> str:
         )
 
 
+def render_resources(run_dict) -> str:
+    """
+    Summarize resources used by a run like "2 CPU / 4.0 GiB" (empty string if no
+    resources are logged). Resources escalated for retries (run.* attributes) are
+    shown instead of the task's configured resources.
+    """
+    attributes = run_dict["attributes"]
+    num_cpus = attributes.get("run.num_cpus", attributes.get("task.num_cpus"))
+    memory = attributes.get("run.memory", attributes.get("task.memory"))
+
+    result: List[str] = []
+    if num_cpus is not None:
+        result += [f"{num_cpus} CPU"]
+    if memory is not None:
+        result += [f"{memory / 2**30:.1f} GiB"]
+    return " / ".join(result)
+
+
 def make_mermaid_gantt_inputfile(spans: Spans) -> str:
     """
     Generate input file for Mermaid diagram generator for creating Gantt diagram
@@ -139,7 +160,13 @@ def make_mermaid_gantt_inputfile(spans: Spans) -> str:
         if task_dict["attributes"]["task.task_type"] != "jupytext":
             raise Exception(f"Unknown task type for {task_dict}")
 
-        output_lines += [f"""    section {task_dict["attributes"]["task.notebook"]}"""]
+        section_title: str = task_dict["attributes"]["task.notebook"]
+        if "task.priority" in task_dict["attributes"]:
+            # show critical path priority used for scheduling (see run_dag)
+            priority: float = task_dict["attributes"]["task.priority"]
+            section_title += f" (priority {priority:.1f})"
+
+        output_lines += [f"""    section {section_title}"""]
 
         for task_run_dict, _ in task_retry_it:
             print("run", task_run_dict)
@@ -151,10 +178,16 @@ def make_mermaid_gantt_inputfile(spans: Spans) -> str:
 
             us_range = get_duration_range_us(task_run_dict)
 
+            description: str = (
+                f"{render_seconds(us_range)} - {_status_summary(task_run_dict)}"
+            )
+            if render_resources(task_run_dict) != "":
+                description += f" ({render_resources(task_run_dict)})"
+
             output_lines += [
                 ", ".join(
                     [
-                        f"""    {render_seconds(us_range)} - {_status_summary(task_run_dict)} :{modifier} """,
+                        f"""    {description} :{modifier} """,
                         f"""{us_range.start // 1000000} """,
                         f"""{us_range.stop // 1000000} """,
                     ]
@@ -231,17 +264,19 @@ def make_mermaid_dag_inputfile(spans: Spans):
         )
 
     for task_dict, run_it in task_it:
-        last_run_dict, _ = list(run_it)[-1]
-
         if task_dict["attributes"]["task.task_type"] != "jupytext":
             raise Exception(f"Unknown task type for {task_dict}")
 
-        linkify = lambda x, ys: make_link(x, ys, last_run_dict)
+        run_dicts = [run_dict for run_dict, _ in run_it]
+        desc, attrs = dag_node_description(task_dict)
 
-        output_lines += [
-            f"    {dag_node_id(task_dict['span_id'])}"
-            f"""["{linkify(*dag_node_description(task_dict))}"]"""
-        ]
+        if len(run_dicts) == 0:
+            # task was cancelled before it started, and there is no run to link to
+            node_text: str = f"<b>{desc}</b> <br />" + "<br />".join(attrs)
+        else:
+            node_text = make_link(desc, attrs, run_dicts[-1])
+
+        output_lines += [f"""    {dag_node_id(task_dict['span_id'])}["{node_text}"]"""]
 
     for span_id_from, span_id_to in pipeline_dict["task_dependencies"]:
         output_lines += [
@@ -1,20 +1,30 @@
-import time, random
-from typing import List, Set, Dict, Tuple
+import contextlib, gc, time, random
+from pathlib import Path
+from typing import Any, List, Set, Dict, Tuple
 
 #
-import ray
+import pytest, ray
 
 #
 from pynb_dag_runner.core.dag_runner import (
     RemoteTaskP,
+    TaskCancelledError,
+    as_completed,
+    as_completed_async,
     TaskOutcome,
     task_from_python_function,
     run_in_sequence,
     fan_in,
+    get_scheduler_metrics,
+    local_executor,
+    map_task,
     start_and_await_tasks,
+    tree_fan_in,
+    run_dag,
 )
 from pynb_dag_runner.opentelemetry_helpers import (
     SpanId,
+    get_duration_range_us,
     get_span_id,
     Spans,
     SpanRecorder,
@@ -202,6 +212,13 @@ def test__task_ot__task_orchestration__fan_in_two_tasks():
 
         assert expected_dependencies == log_dependencies
 
+        # time from last upstream task completing to fan-in task starting is logged
+        fan_in_span = one(spans.filter(["attributes", "task.foo"], "fan_in"))
+        assert 0 <= fan_in_span["attributes"]["task.dispatch_latency_s"] < 5.0
+        for func_name in ["f1", "f2"]:
+            task_span = one(spans.filter(["attributes", "task.foo"], func_name))
+            assert "task.dispatch_latency_s" not in task_span["attributes"]
+
     validate_spans(get_test_spans())
 
 
@@ -246,3 +263,549 @@ def test__task_ot__task_orchestration__run_three_tasks_in_parallel__failed():
         assert len(extract_task_dependencies(spans)) == 0
 
     validate_spans(get_test_spans())
+
+
+def test__task_ot__task_orchestration__run_long_sequence_of_tasks():
+    # All tasks are held by one scheduler actor, so a long sequence of tasks should
+    # not require one Ray actor per task.
+    N_tasks = 50
+
+    def get_test_spans() -> Spans:
+        with SpanRecorder() as sr:
+
+            def f(arg):
+                if arg is None:
+                    return 0
+                assert isinstance(arg, TaskOutcome)
+                assert arg.error is None
+                return arg.return_value + 1
+
+            tasks: List[RemoteTaskP] = [
+                task_from_python_function(
+                    f, attributes={"task.nr": k}, num_cpus=0, timeout_s=20.0
+                )
+                for k in range(N_tasks)
+            ]
+            run_in_sequence(*tasks)
+
+            [outcome] = start_and_await_tasks([tasks[0]], [tasks[-1]], timeout_s=300)
+
+            assert isinstance(outcome, TaskOutcome)
+            assert outcome.error is None
+            assert outcome.return_value == N_tasks - 1
+
+        return sr.spans
+
+    def validate_spans(spans: Spans):
+        assert len(spans.filter(["name"], "execute-task")) == N_tasks
+        assert len(extract_task_dependencies(spans)) == N_tasks - 1
+
+    validate_spans(get_test_spans())
+
+
+def test__task_ot__task_orchestration__run_dag_diamond():
+    #
+    #        --->  task_b  ---
+    #       /                 v
+    #  task_a                  task_d
+    #       \                 ^
+    #        --->  task_c  ---
+    #
+    def get_test_spans() -> Spans:
+        with SpanRecorder() as sr:
+
+            def f_a(arg):
+                assert arg == 10
+                return 1
+
+            def f_b(arg):
+                assert isinstance(arg, TaskOutcome)
+                return arg.return_value + 10
+
+            def f_c(arg):
+                assert isinstance(arg, TaskOutcome)
+                return arg.return_value + 100
+
+            def f_d(arg):
+                assert isinstance(arg, list)
+                return sum(outcome.return_value for outcome in arg)
+
+            task_a, task_b, task_c, task_d = [
+                task_from_python_function(f, attributes={"task.foo": name})
+                for f, name in [(f_a, "a"), (f_b, "b"), (f_c, "c"), (f_d, "d")]
+            ]
+
+            outcomes = run_dag(
+                tasks=[task_d, task_c, task_b, task_a],
+                edges=[
+                    (task_a, task_b),
+                    (task_a, task_c),
+                    (task_b, task_d),
+                    (task_c, task_d),
+                ],
+                timeout_s=100,
+                arg=10,
+            )
+
+            assert all(isinstance(outcome, TaskOutcome) for outcome in outcomes)
+            assert all(outcome.error is None for outcome in outcomes)
+            assert [outcome.return_value for outcome in outcomes] == [112, 101, 11, 1]
+
+        return sr.spans
+
+    def validate_spans(spans: Spans):
+        def lookup_task_span_id(func_name: str) -> SpanId:
+            return get_span_id(one(spans.filter(["attributes", "task.foo"], func_name)))
+
+        assert extract_task_dependencies(spans) == set(
+            (lookup_task_span_id(a), lookup_task_span_id(b))
+            for a, b in [("a", "b"), ("a", "c"), ("b", "d"), ("c", "d")]
+        )
+
+        for func_name in ["b", "c", "d"]:
+            task_span = one(spans.filter(["attributes", "task.foo"], func_name))
+            assert 0 <= task_span["attributes"]["task.dispatch_latency_s"] < 5.0
+
+    validate_spans(get_test_spans())
+
+
+def test__task_ot__task_orchestration__run_dag_invalid_dags():
+    tasks: List[RemoteTaskP] = [
+        task_from_python_function(lambda _: None) for _ in range(3)
+    ]
+    t0, t1, t2 = tasks
+
+    for edges in [
+        # cycle
+        [(t0, t1), (t1, t2), (t2, t0)],
+        # dangling edge
+        [(t0, task_from_python_function(lambda _: None))],
+        # duplicate edge
+        [(t0, t1), (t0, t1)],
+    ]:
+        with pytest.raises(ValueError):
+            run_dag(tasks, edges)
+
+    # no task should have started
+    for task in tasks:
+        assert ray.get(task.has_started.remote()) == False
+
+
+def test__task_ot__task_orchestration__return_values_in_object_store():
+    def f_a(_):
+        return list(range(10))
+
+    def f_b(_):
+        return list(range(10, 20))
+
+    def f_fan_in(arg):
+        # upstream return values are resolved from the object store before f is called
+        assert isinstance(arg, list)
+        return sum(sum(outcome.return_value) for outcome in arg)
+
+    task_a, task_b = [
+        task_from_python_function(f, return_value_to_object_store=True)
+        for f in [f_a, f_b]
+    ]
+    task_fan_in = task_from_python_function(f_fan_in)
+
+    outcome_fan_in, outcome_a = run_dag(
+        tasks=[task_fan_in, task_a, task_b],
+        edges=[(task_a, task_fan_in), (task_b, task_fan_in)],
+        timeout_s=100,
+    )[:2]
+
+    assert outcome_fan_in.error is None
+    assert outcome_fan_in.return_value == sum(range(20))
+
+    assert isinstance(outcome_a.return_value, ray._raylet.ObjectRef)
+    assert ray.get(outcome_a.return_value) == list(range(10))
+
+
+def test__task_ot__task_orchestration__run_dag_critical_path_priorities():
+    #  chain0 ---> chain1 ---> chain2      short0  short1  short2  short3
+    def f(_):
+        time.sleep(0.1)
+
+    def get_test_spans() -> Spans:
+        with SpanRecorder() as sr:
+            short_tasks = [
+                task_from_python_function(f, attributes={"task.foo": f"short{k}"})
+                for k in range(4)
+            ]
+            chain_tasks = [
+                task_from_python_function(f, attributes={"task.foo": f"chain{k}"})
+                for k in range(3)
+            ]
+
+            outcomes = run_dag(
+                tasks=short_tasks + chain_tasks,
+                edges=[
+                    (chain_tasks[0], chain_tasks[1]),
+                    (chain_tasks[1], chain_tasks[2]),
+                ],
+                timeout_s=100,
+                # chain2 has no estimate, and is assumed to have the mean duration 2/3
+                duration_estimates_s={
+                    **{task: 0.5 for task in short_tasks},
+                    chain_tasks[0]: 1.0,
+                    chain_tasks[1]: 1.0,
+                },
+            )
+            assert all(outcome.error is None for outcome in outcomes)
+
+        return sr.spans
+
+    def validate_spans(spans: Spans):
+        task_spans = spans.filter(["name"], "execute-task")
+        assert len(task_spans) == 7
+
+        def lookup_task_span(name: str):
+            return one(task_spans.filter(["attributes", "task.foo"], name))
+
+        # priority = critical path length from task start to end of DAG
+        for name, expected_priority in [
+            ("chain0", 2 + 2 / 3),
+            ("chain1", 1 + 2 / 3),
+            ("chain2", 2 / 3),
+            *[(f"short{k}", 0.5) for k in range(4)],
+        ]:
+            priority = lookup_task_span(name)["attributes"]["task.priority"]
+            assert abs(priority - expected_priority) < 1e-6
+
+        # task with highest priority is started first
+        first_task_span = min(task_spans, key=lambda s: get_duration_range_us(s).start)
+        assert first_task_span == lookup_task_span("chain0")
+
+        # at most two tasks (= number of CPUs in test cluster) run at the same time
+        for task_span in task_spans:
+            t: int = get_duration_range_us(task_span).start
+            assert sum(t in get_duration_range_us(s) for s in task_spans) <= 2
+
+    validate_spans(get_test_spans())
+
+
+def test__task_ot__task_orchestration__run_dag_failure_policy_skip_downstream():
+    #  fail ---> down1 ---> down2      ok
+    def f_fail(_):
+        raise Exception("task failed")
+
+    def f_ok(_):
+        return 42
+
+    with SpanRecorder() as sr:
+        task_fail = task_from_python_function(f_fail, attributes={"task.foo": "fail"})
+        task_down1, task_down2, task_ok = [
+            task_from_python_function(f_ok, attributes={"task.foo": name})
+            for name in ["down1", "down2", "ok"]
+        ]
+
+        outcome_fail, outcome_down1, outcome_down2, outcome_ok = run_dag(
+            tasks=[task_fail, task_down1, task_down2, task_ok],
+            edges=[(task_fail, task_down1), (task_down1, task_down2)],
+            timeout_s=100,
+            failure_policy="skip-downstream",
+        )
+
+    assert str(outcome_fail.error) == "task failed"
+    assert isinstance(outcome_down1.error, TaskCancelledError)
+    assert isinstance(outcome_down2.error, TaskCancelledError)
+    assert outcome_ok.return_value == 42 and outcome_ok.error is None
+
+    # cancelled tasks are logged, and are not run
+    task_spans = sr.spans.filter(["name"], "execute-task")
+    for name in ["fail", "down1", "down2", "ok"]:
+        task_span = one(task_spans.filter(["attributes", "task.foo"], name))
+        assert task_span["attributes"].get("task.cancelled", False) == (
+            name in ["down1", "down2"]
+        )
+    assert len(sr.spans.filter(["name"], "call-python-function")) == 2
+
+    # task dependencies are logged also for cancelled tasks
+    assert len(extract_task_dependencies(sr.spans)) == 2
+
+
+def test__task_ot__task_orchestration__run_dag_failure_policy_fail_fast(
+    tmp_path: Path,
+):
+    #  fail ----------------> down
+    #  slow -------------------^
+    def f_fail(_):
+        time.sleep(1.0)
+        raise Exception("task failed")
+
+    def f_slow(_):
+        time.sleep(10.0)
+        (tmp_path / "slow_task_done.txt").write_text("done")
+
+    def f_down(_):
+        return 42
+
+    with SpanRecorder() as sr:
+        task_fail = task_from_python_function(f_fail, attributes={"task.foo": "fail"})
+        task_slow = task_from_python_function(f_slow, attributes={"task.foo": "slow"})
+        task_down = task_from_python_function(f_down, attributes={"task.foo": "down"})
+
+        outcome_fail, outcome_slow, outcome_down = run_dag(
+            tasks=[task_fail, task_slow, task_down],
+            edges=[(task_fail, task_down), (task_slow, task_down)],
+            timeout_s=100,
+            failure_policy="fail-fast",
+        )
+
+    assert str(outcome_fail.error) == "task failed"
+    assert isinstance(outcome_slow.error, TaskCancelledError)
+    assert isinstance(outcome_down.error, TaskCancelledError)
+
+    task_spans = sr.spans.filter(["name"], "execute-task")
+    for name in ["fail", "slow", "down"]:
+        task_span = one(task_spans.filter(["attributes", "task.foo"], name))
+        assert task_span["attributes"].get("task.cancelled", False) == (
+            name in ["slow", "down"]
+        )
+
+    # the running slow task was interrupted
+    slow_span = one(task_spans.filter(["attributes", "task.foo"], "slow"))
+    assert (
+        get_duration_range_us(slow_span).stop - get_duration_range_us(slow_span).start
+        < 10 * 1e6
+    )
+
+    time.sleep(12.0)
+    assert not (tmp_path / "slow_task_done.txt").exists()
+
+
+def test__task_ot__task_orchestration__run_dag_unknown_failure_policy():
+    task = task_from_python_function(lambda _: 42)
+
+    with pytest.raises(ValueError):
+        run_dag(tasks=[task], edges=[], failure_policy="unknown-policy")
+
+
+def test__task_ot__task_orchestration__map_task_over_upstream_list():
+    def get_test_spans() -> Spans:
+        with SpanRecorder() as rec:
+            # length of list is only known once the upstream task has run
+            list_task: RemoteTaskP = task_from_python_function(
+                lambda _: list(range(10))
+            )
+            square_task: RemoteTaskP = map_task(
+                lambda x: x * x,
+                chunk_size=3,
+                max_parallel=2,
+                attributes={"task.foo": "map"},
+            )
+
+            [_, outcome] = run_dag(
+                [list_task, square_task], edges=[(list_task, square_task)]
+            )
+
+            assert outcome.error is None
+            assert outcome.return_value == [x * x for x in range(10)]
+
+        return rec.spans
+
+    def validate_spans(spans: Spans):
+        map_task_span = one(
+            spans.filter(["name"], "execute-task")
+            # -
+            .filter(["attributes", "task.foo"], "map")
+        )
+        assert map_task_span["attributes"]["task.chunk_size"] == 3
+        assert map_task_span["attributes"]["task.max_parallel"] == 2
+
+        # every chunk is logged as its own run
+        run_spans = spans.bound_under(map_task_span).filter(["name"], "retry-call")
+        assert sorted(s["attributes"]["run.chunk_nr"] for s in run_spans) == [
+            0,
+            1,
+            2,
+            3,
+        ]
+
+    validate_spans(get_test_spans())
+
+
+def test__task_ot__task_orchestration__map_task_failures():
+    def f(x):
+        if x == 4:
+            raise Exception("failed on item 4")
+        return x
+
+    # failed chunk (with retries) fails task
+    task = map_task(f, chunk_size=2, max_nr_retries=2)
+    with SpanRecorder() as rec:
+        [outcome] = start_and_await_tasks([task], [task], timeout_s=100, arg=range(6))
+
+    assert "failed on item 4" in str(outcome.error)
+    run_spans = rec.spans.filter(["name"], "retry-call")
+    assert sorted(s["attributes"]["run.chunk_nr"] for s in run_spans) == [0, 1, 2, 2]
+
+    # failed upstream task
+    task_fail = task_from_python_function(lambda _: 1 / 0)
+    task_map = map_task(f)
+    [_, outcome] = run_dag([task_fail, task_map], edges=[(task_fail, task_map)])
+    assert isinstance(outcome.error, Exception)
+
+    # empty list
+    task = map_task(f)
+    [outcome] = start_and_await_tasks([task], [task], timeout_s=100, arg=[])
+    assert outcome.return_value == []
+
+    with pytest.raises(ValueError):
+        map_task(f, chunk_size=0)
+
+
+@pytest.mark.parametrize("use_combine_fn", [False, True])
+def test__task_ot__task_orchestration__tree_fan_in(use_combine_fn: bool):
+    def sum_return_values(outcomes: List[Any]) -> int:
+        return sum(outcome.return_value for outcome in outcomes)
+
+    def f_target(outcomes: List[Any]) -> int:
+        if use_combine_fn:
+            # top-level combine tasks have already summed values
+            return sum_return_values(outcomes)
+        else:
+            # default: combine tasks return lists with upstream TaskOutcome:s
+            upstream_outcomes: List[Any] = [
+                outcome for o in outcomes for outcome in o.return_value
+            ]
+            assert [o.return_value for o in upstream_outcomes] == list(range(20))
+            return sum_return_values(upstream_outcomes)
+
+    with SpanRecorder() as rec:
+
+        def make_f(k: int):
+            return lambda _: k
+
+        tasks: List[RemoteTaskP] = [
+            task_from_python_function(make_f(k)) for k in range(20)
+        ]
+        target_task: RemoteTaskP = task_from_python_function(f_target)
+
+        # 20 tasks ---> 7 combine tasks ---> 3 combine tasks ---> target task
+        combine_tasks = tree_fan_in(
+            tasks,
+            target_task,
+            branching_factor=3,
+            combine_fns=[sum_return_values] if use_combine_fn else [],
+        )
+        assert len(combine_tasks) == 7 + 3
+
+        [outcome] = start_and_await_tasks(tasks, [target_task], timeout_s=100)
+        assert outcome.error is None
+        assert outcome.return_value == sum(range(20))
+
+    combine_spans = rec.spans.filter(["name"], "execute-task").filter(
+        ["attributes", "task.fan_in_level"], 1
+    )
+    assert len(combine_spans) == 3
+    assert len(extract_task_dependencies(rec.spans)) == 20 + 7 + 3
+
+
+def test__task_ot__task_orchestration__tree_fan_in_narrow():
+    # no combine tasks needed
+    tasks = [task_from_python_function(lambda _: 1) for _ in range(3)]
+    target_task = task_from_python_function(lambda _: 1)
+    assert tree_fan_in(tasks, target_task, branching_factor=3) == []
+
+    with pytest.raises(ValueError):
+        tree_fan_in(tasks, target_task, branching_factor=1)
+
+
+def _make_tasks_for_as_completed() -> List[RemoteTaskP]:
+    # task_a ---> task_b (fails) ---> task_c
+    def f_a(_):
+        return "a"
+
+    def f_b(_):
+        raise Exception("failed")
+
+    def f_c(_):
+        return "c"
+
+    tasks = [task_from_python_function(f) for f in [f_a, f_b, f_c]]
+    run_in_sequence(*tasks)
+    return tasks
+
+
+@pytest.mark.parametrize("fetch_return_values", [True, False])
+def test__task_ot__task_orchestration__as_completed(fetch_return_values: bool):
+    task_a, task_b, task_c = _make_tasks_for_as_completed()
+
+    completed = list(
+        as_completed(
+            [task_a],
+            [task_c, task_b, task_a],
+            timeout_s=100,
+            fetch_return_values=fetch_return_values,
+        )
+    )
+
+    # tasks are returned in the order they complete
+    assert [task for task, _ in completed] == [task_a, task_b, task_c]
+    assert [outcome.return_value for _, outcome in completed] == (
+        ["a", None, "c"] if fetch_return_values else [None, None, None]
+    )
+    assert [outcome.error is None for _, outcome in completed] == [True, False, True]
+
+
+@pytest.mark.asyncio
+async def test__task_ot__task_orchestration__as_completed_async():
+    task_a, task_b, task_c = _make_tasks_for_as_completed()
+
+    completed = [
+        (task, outcome)
+        async for task, outcome in as_completed_async(
+            [task_a], [task_c, task_b, task_a], timeout_s=100
+        )
+    ]
+
+    assert [task for task, _ in completed] == [task_a, task_b, task_c]
+    assert [outcome.return_value for _, outcome in completed] == ["a", None, "c"]
+
+
+def test__task_ot__task_orchestration__as_completed_timeout():
+    task_a, _, task_c = _make_tasks_for_as_completed()
+
+    # task_a is never started (only task_c is started)
+    with pytest.raises(ray.exceptions.GetTimeoutError):
+        list(as_completed([task_c], [task_a], timeout_s=1.0))
+
+
+@pytest.mark.parametrize("use_local_executor", [False, True])
+def test__task_ot__task_orchestration__release_tasks_when_handles_dropped(
+    use_local_executor: bool,
+):
+    def f(_):
+        return bytes(10**6)
+
+    with local_executor() if use_local_executor else contextlib.nullcontext():
+        gc.collect()
+        metrics_before = get_scheduler_metrics(timeout_s=10)
+
+        tasks = [task_from_python_function(f) for _ in range(3)]
+        run_in_sequence(*tasks)
+        [outcome] = start_and_await_tasks(tasks[:1], tasks[-1:], timeout_s=100)
+        assert len(outcome.return_value) == 10**6
+
+        metrics_run = get_scheduler_metrics(timeout_s=10)
+        assert (
+            metrics_run["nr_live_tasks"]
+            == metrics_run["nr_completed_live_tasks"]
+            == metrics_before["nr_live_tasks"] + 3
+        )
+        assert (
+            metrics_run["result_bytes"] - metrics_before["result_bytes"] > 3 * 10**6
+        )
+
+        # results of tasks are released when their handles are garbage collected
+        del tasks
+        gc.collect()
+        metrics_after = get_scheduler_metrics(timeout_s=10)
+        assert metrics_after["nr_live_tasks"] == metrics_before["nr_live_tasks"]
+        assert metrics_after["result_bytes"] == metrics_before["result_bytes"]
+        assert (
+            metrics_after["nr_released_tasks"]
+            == metrics_before["nr_released_tasks"] + 3
+        )
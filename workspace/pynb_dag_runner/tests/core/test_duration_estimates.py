@@ -0,0 +1,28 @@
+import time
+
+#
+from pynb_dag_runner.core.dag_runner import task_from_python_function, run_dag
+from pynb_dag_runner.core.duration_estimates import duration_estimates_from_spans
+from pynb_dag_runner.opentelemetry_helpers import SpanRecorder
+
+
+def test__duration_estimates__from_previous_run():
+    def f(_):
+        time.sleep(0.5)
+
+    def make_tasks():
+        return [
+            task_from_python_function(f, attributes={"task.foo": name})
+            for name in ["a", "b"]
+        ]
+
+    with SpanRecorder() as rec:
+        run_dag(tasks=make_tasks(), edges=[], timeout_s=100)
+
+    # new tasks with same fingerprints as in previous run have estimates
+    task_a, task_b = make_tasks()
+    task_c = task_from_python_function(f, attributes={"task.foo": "c"})
+
+    estimates = duration_estimates_from_spans([task_a, task_b, task_c], rec.spans)
+    assert estimates.keys() == {task_a, task_b}
+    assert all(0.5 < duration_s < 100 for duration_s in estimates.values())
@@ -0,0 +1,130 @@
+from pathlib import Path
+from typing import Any, Dict
+
+#
+from pynb_dag_runner.helpers import one
+from pynb_dag_runner.core.dag_runner import task_from_python_function, run_dag
+from pynb_dag_runner.core.incremental_run import (
+    PreviousTaskRun,
+    get_invalidated_tasks,
+    run_dag_incremental,
+)
+from pynb_dag_runner.core.task_cache import CachedResult
+from pynb_dag_runner.opentelemetry_helpers import read_key, Spans, SpanRecorder
+from pynb_dag_runner.tasks.task_opentelemetry_logging import (
+    _log_named_value,
+    get_logged_artifacts,
+    get_logged_values,
+)
+
+
+def test__incremental_run__get_invalidated_tasks():
+    #  a ---> b ---> c      d
+    edges = [("a", "b"), ("b", "c")]
+
+    def previous_run(*upstream_fingerprints: str) -> PreviousTaskRun:
+        return PreviousTaskRun(
+            span_id="dummy",
+            upstream_fingerprints=upstream_fingerprints,
+            result=CachedResult(return_value=None, logged_values=[]),
+        )
+
+    previous_task_runs: Dict[str, PreviousTaskRun] = {
+        "fp-a": previous_run(),
+        "fp-b": previous_run("fp-a"),
+        "fp-c": previous_run("fp-b"),
+        "fp-d": previous_run(),
+    }
+    fingerprints = {"a": "fp-a", "b": "fp-b", "c": "fp-c", "d": "fp-d"}
+
+    # no changes
+    assert get_invalidated_tasks(fingerprints, edges, previous_task_runs) == set()
+
+    # change in b invalidates also c
+    for fp_b in ["fp-b-changed", "fp-a"]:
+        assert get_invalidated_tasks(
+            {**fingerprints, "b": fp_b}, edges, previous_task_runs
+        ) == {"b", "c"}
+
+    # new task
+    assert get_invalidated_tasks(
+        {**fingerprints, "e": "fp-e"}, edges + [("e", "c")], previous_task_runs
+    ) == {"c", "e"}
+
+    # new dependency
+    assert get_invalidated_tasks(
+        fingerprints, edges + [("d", "c")], previous_task_runs
+    ) == {"c"}
+
+    # failed tasks are not included in previous runs
+    assert get_invalidated_tasks(fingerprints, edges, {}) == {"a", "b", "c", "d"}
+
+
+def test__incremental_run__only_invalidated_tasks_are_rerun(tmp_path: Path):
+    def f(name: str):
+        def _f(_):
+            with open(tmp_path / "calls.txt", "a") as calls_file:
+                calls_file.write(name)
+
+            _log_named_value(name=f"value_{name}", content=name, content_type="utf-8")
+            _log_named_value(
+                name=f"file_{name}.bin",
+                content=name.encode("utf-8"),
+                content_type="bytes",
+                is_file=True,
+            )
+
+        return _f
+
+    def run_pipeline(version_b: int, previous_spans: Any = None) -> Spans:
+        #  a ---> b ---> c      d
+        with SpanRecorder() as rec:
+            task_a, task_c, task_d = [
+                task_from_python_function(f(name), attributes={"task.name": name})
+                for name in ["a", "c", "d"]
+            ]
+            task_b = task_from_python_function(
+                f("b"), attributes={"task.name": "b", "task.version": version_b}
+            )
+            tasks = [task_a, task_b, task_c, task_d]
+            edges = [(task_a, task_b), (task_b, task_c)]
+
+            if previous_spans is None:
+                outcomes = run_dag(tasks, edges, timeout_s=100)
+            else:
+                outcomes = run_dag_incremental(
+                    tasks, edges, previous_spans, timeout_s=100
+                )
+            assert all(outcome.error is None for outcome in outcomes)
+
+        return rec.spans
+
+    def validate_spans(spans: Spans, reused_tasks):
+        for name in ["a", "b", "c", "d"]:
+            task_span = one(spans.filter(["attributes", "task.name"], name))
+            assert read_key(task_span, ["attributes"]).get("task.reused", False) == (
+                name in reused_tasks
+            )
+
+        # values and artefacts are logged (or replayed) for all tasks
+        assert get_logged_values(spans) == {f"value_{k}": k for k in "abcd"}
+        assert get_logged_artifacts(spans) == {
+            f"file_{k}.bin": k.encode("utf-8") for k in "abcd"
+        }
+
+    def calls() -> str:
+        return "".join(sorted((tmp_path / "calls.txt").read_text()))
+
+    spans1 = run_pipeline(version_b=1)
+    validate_spans(spans1, reused_tasks=[])
+    assert calls() == "abcd"
+
+    # no changes
+    spans2 = run_pipeline(version_b=1, previous_spans=spans1)
+    validate_spans(spans2, reused_tasks=["a", "b", "c", "d"])
+    assert calls() == "abcd"
+
+    # change b (rerun b and c); reused tasks replay previously replayed values
+    spans3 = run_pipeline(version_b=2, previous_spans=spans2)
+    validate_spans(spans3, reused_tasks=["a", "d"])
+    assert calls() == "abbccd"
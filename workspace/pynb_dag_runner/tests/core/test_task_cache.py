@@ -0,0 +1,101 @@
+import time
+from pathlib import Path
+
+#
+from pynb_dag_runner.helpers import one
+from pynb_dag_runner.core.dag_runner import task_from_python_function, run_dag
+from pynb_dag_runner.core.task_cache import CachedResult, TaskCache
+from pynb_dag_runner.opentelemetry_helpers import read_key, Spans, SpanRecorder
+from pynb_dag_runner.opentelemetry_task_span_parser import get_pipeline_iterators
+from pynb_dag_runner.tasks.task_opentelemetry_logging import (
+    _log_named_value,
+    get_logged_values,
+)
+
+
+def test__task_cache__get_put_and_evict_least_recently_used(tmp_path: Path):
+    # cache with room for two entries
+    cache = TaskCache(tmp_path / "cache", max_size_bytes=2500)
+    entry = CachedResult(return_value=1000 * "x", logged_values=[])
+
+    assert cache.get("key0") is None
+
+    cache.put("key0", entry)
+    time.sleep(0.05)
+    cache.put("key1", entry)
+    time.sleep(0.05)
+
+    # reading key0 makes key1 the least recently used entry
+    assert cache.get("key0") == entry
+    time.sleep(0.05)
+
+    cache.put("key2", entry)
+    assert cache.get("key0") == entry
+    assert cache.get("key1") is None
+    assert cache.get("key2") == entry
+
+
+def test__task_cache__python_tasks_are_skipped_on_cache_hit(tmp_path: Path):
+    cache = TaskCache(tmp_path / "cache")
+    calls_path: Path = tmp_path / "calls.txt"
+    calls_path.write_text("")
+
+    def f_upstream(arg):
+        return arg
+
+    def f(arg):
+        calls_path.write_text(calls_path.read_text() + ".")
+        _log_named_value(name="foo", content=123, content_type="int")
+
+        return arg.return_value + 1
+
+    def run_pipeline(arg: int) -> Spans:
+        with SpanRecorder() as rec:
+            task_upstream = task_from_python_function(f_upstream)
+            task = task_from_python_function(
+                f, attributes={"task.foo": "bar"}, cache=cache
+            )
+
+            outcome = run_dag(
+                tasks=[task_upstream, task],
+                edges=[(task_upstream, task)],
+                timeout_s=100,
+                arg=arg,
+            )[1]
+
+            assert outcome.error is None
+            assert outcome.return_value == arg + 1
+
+        return rec.spans
+
+    def validate_spans(spans: Spans, expect_cache_hit: bool):
+        task_span = one(spans.filter(["attributes", "task.foo"], "bar"))
+        assert read_key(task_span, ["attributes", "task.cache_hit"]) == expect_cache_hit
+
+        # logged values are replayed on cache hits
+        assert get_logged_values(spans) == {"foo": 123}
+
+        # cached runs are reported as a run by the span parser
+        _, task_iterator = get_pipeline_iterators(spans)
+        for task_dict, run_iterator in task_iterator:
+            if task_dict["attributes"].get("task.foo") == "bar":
+                run_dict, _ = one(run_iterator)
+                assert run_dict["logged_values"] == {
+                    "foo": {"value": 123, "type": "int"}
+                }
+                assert run_dict["attributes"].get("run.cached", False) == (
+                    expect_cache_hit
+                )
+
+    validate_spans(run_pipeline(arg=1), expect_cache_hit=False)
+    assert calls_path.read_text() == "."
+
+    validate_spans(run_pipeline(arg=1), expect_cache_hit=True)
+    assert calls_path.read_text() == "."
+
+    # changing upstream return value changes cache key
+    validate_spans(run_pipeline(arg=2), expect_cache_hit=False)
+    assert calls_path.read_text() == ".."
+
+    validate_spans(run_pipeline(arg=2), expect_cache_hit=True)
+    assert calls_path.read_text() == ".."
@@ -13,6 +13,7 @@ from pynb_dag_runner.core.dag_runner import start_and_await_tasks
 from pynb_dag_runner.helpers import one
 from pynb_dag_runner.opentelemetry_task_span_parser import get_pipeline_iterators
 from pynb_dag_runner.notebooks_helpers import JupytextNotebook
+from pynb_dag_runner.ray_helpers import default_thread_limits
 from pynb_dag_runner.opentelemetry_helpers import (
     Spans,
     SpanRecorder,
@@ -79,6 +80,10 @@ def test__jupytext_notebook_task__ok_notebook__parsed_spans(
     assert expected_pipeline_attributes == pipeline_dict["attributes"]
 
     for task_dict, run_it in [one(task_it)]:
+        # task fingerprint is a sha256 hash of notebook source and parameters
+        fingerprint = task_dict["attributes"]["task.fingerprint"]
+        assert isinstance(fingerprint, str) and len(fingerprint) == 64
+
         expected_task_attributes = {
             **expected_pipeline_attributes,
             "task.variable_a": "task-value",
@@ -87,6 +92,7 @@ def test__jupytext_notebook_task__ok_notebook__parsed_spans(
             "task.num_cpus": 1,
             "task.task_type": "jupytext",
             "task.timeout_s": 10.0,
+            "task.fingerprint": fingerprint,
         }
         assert expected_task_attributes == task_dict["attributes"]
 
@@ -95,6 +101,7 @@ def test__jupytext_notebook_task__ok_notebook__parsed_spans(
                 **expected_pipeline_attributes,
                 **expected_task_attributes,
                 "run.retry_nr": 0,
+                **{f"run.env.{k}": "1" for k in default_thread_limits(1)},
             }
             assert expected_run_attributes == run_dict["attributes"]
 
@@ -153,6 +160,10 @@ def test__jupytext_notebook_task__ok_notebook__main_tests(ok_notebook_run_spans:
 
             assert task_dict["status"] == {"status_code": "OK"}  # type: ignore
 
+            # task fingerprint is a sha256 hash of notebook source and parameters
+            fingerprint = task_dict["attributes"]["task.fingerprint"]  # type: ignore
+            assert isinstance(fingerprint, str) and len(fingerprint) == 64
+
             expected_task_attributes: Dict[str, Any] = {
                 "task.variable_a": "task-value",
                 "task.max_nr_retries": 2,
@@ -160,6 +171,7 @@ def test__jupytext_notebook_task__ok_notebook__main_tests(ok_notebook_run_spans:
                 "task.num_cpus": 1,
                 "task.task_type": "jupytext",
                 "task.timeout_s": 10.0,
+                "task.fingerprint": fingerprint,
             }
             assert {
                 **expected_pipeline_attributes,
@@ -170,6 +182,7 @@ def test__jupytext_notebook_task__ok_notebook__main_tests(ok_notebook_run_spans:
                 assert run_dict.keys() == common_keys | {"logged_values"}
                 expected_run_attributes: Dict[str, Any] = {
                     "run.retry_nr": 0,
+                    **{f"run.env.{k}": "1" for k in default_thread_limits(1)},
                     **expected_pipeline_attributes,
                     **expected_task_attributes,
                 }
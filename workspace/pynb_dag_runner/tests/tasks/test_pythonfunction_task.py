@@ -1,4 +1,4 @@
-import time, random, itertools
+import os, time, random, itertools
 from typing import List, Set, Tuple
 
 #
@@ -7,7 +7,10 @@ import opentelemetry as otel
 
 #
 from pynb_dag_runner.opentelemetry_helpers import SpanId, Spans
-from pynb_dag_runner.opentelemetry_task_span_parser import extract_task_dependencies
+from pynb_dag_runner.opentelemetry_task_span_parser import (
+    extract_task_dependencies,
+    get_pipeline_iterators,
+)
 from pynb_dag_runner.helpers import (
     one,
     pairs,
@@ -24,6 +27,7 @@ from pynb_dag_runner.core.dag_runner import (
     RemoteTaskP,
     task_from_python_function,
 )
+from pynb_dag_runner.ray_helpers import ResourceEscalation
 from pynb_dag_runner.opentelemetry_helpers import (
     get_duration_range_us,
     read_key,
@@ -484,6 +488,129 @@ def test__python_function_task__task_is_retried_until_success():
     validate_spans(get_test_spans())
 
 
+def test__python_function_task__retries_with_escalated_resources():
+    def f(_):
+        time.sleep(1.0)
+        return otel.baggage.get_all()
+
+    with SpanRecorder() as rec:
+        task = task_from_python_function(
+            f=f,
+            max_nr_retries=5,
+            timeout_s=0.4,
+            resource_escalation=ResourceEscalation(
+                timeout_multiplier=2.0, num_cpus_multiplier=2.0, max_num_cpus=2
+            ),
+        )
+        [outcome] = start_and_await_tasks([task], [task], timeout_s=100)
+
+    # timeouts 0.4s and 0.8s fail, and 1.6s succeeds
+    assert outcome.error is None
+    assert outcome.return_value["run.timeout_s"] == "1.6"
+    assert outcome.return_value["run.num_cpus"] == "2"
+
+    _, tasks_it = get_pipeline_iterators(rec.spans)
+    for task_dict, runs_it in [one(tasks_it)]:  # type: ignore
+        assert task_dict["attributes"]["task.timeout_s"] == 0.4
+        assert task_dict["attributes"]["task.num_cpus"] == 1
+
+        assert [
+            (
+                run_dict["attributes"]["run.retry_nr"],
+                run_dict["attributes"]["run.timeout_s"],
+                run_dict["attributes"]["run.num_cpus"],
+            )
+            for run_dict, _ in runs_it
+        ] == [(0, 0.4, 1), (1, 0.8, 2), (2, 1.6, 2)]
+
+
+def test__python_function_task__requested_resources_are_logged():
+    def f(_):
+        return 123
+
+    with SpanRecorder() as rec:
+        task = task_from_python_function(
+            f=f, memory=100 * 2**20, scheduling_strategy="SPREAD"
+        )
+        [outcome] = start_and_await_tasks([task], [task], timeout_s=100)
+
+    assert outcome.return_value == 123
+
+    _, tasks_it = get_pipeline_iterators(rec.spans)
+    for task_dict, _ in [one(tasks_it)]:  # type: ignore
+        assert task_dict["attributes"]["task.num_cpus"] == 1
+        assert task_dict["attributes"]["task.memory"] == 100 * 2**20
+        assert task_dict["attributes"]["task.scheduling_strategy"] == "SPREAD"
+
+    with pytest.raises(ValueError):
+        task_from_python_function(f=f, scheduling_strategy="unknown-strategy")
+
+
+def test__python_function_task__thread_limits():
+    def f(_):
+        return {k: v for k, v in os.environ.items() if k.endswith("_THREADS")}
+
+    with SpanRecorder() as rec:
+        task_default = task_from_python_function(
+            f=f, num_cpus=2, attributes={"task.id": "default"}
+        )
+        task_override = task_from_python_function(
+            f=f, thread_limits={"MKL_NUM_THREADS": 3}, attributes={"task.id": "custom"}
+        )
+        outcome_default, outcome_override = start_and_await_tasks(
+            [task_default, task_override],
+            [task_default, task_override],
+            timeout_s=100,
+        )
+
+    for k in ["OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS"]:
+        assert outcome_default.return_value[k] == "2"
+    assert outcome_override.return_value["MKL_NUM_THREADS"] == "3"
+
+    # effective settings are logged as run attributes
+    _, tasks_it = get_pipeline_iterators(rec.spans)
+    for task_dict, runs_it in tasks_it:
+        for run_dict, _ in [one(runs_it)]:  # type: ignore
+            env_attributes = {
+                k: v
+                for k, v in run_dict["attributes"].items()
+                if k.startswith("run.env.")
+            }
+            if task_dict["attributes"]["task.id"] == "default":
+                assert len(env_attributes) >= 3
+                assert set(env_attributes.values()) == {"2"}
+            else:
+                assert env_attributes == {"run.env.MKL_NUM_THREADS": "3"}
+
+
+def test__resource_escalation__schedule():
+    escalation = ResourceEscalation(
+        timeout_multiplier=2.0,
+        max_timeout_s=30.0,
+        num_cpus_multiplier=1.5,
+        memory_multiplier=2.0,
+        max_memory=2**32,
+    )
+    assert [escalation.get_timeout_s(10.0, k) for k in range(4)] == [
+        10.0,
+        20.0,
+        30.0,
+        30.0,
+    ]
+    assert escalation.get_timeout_s(None, 3) is None
+    assert [escalation.get_num_cpus(1, k) for k in range(4)] == [1, 2, 3, 4]
+    assert [escalation.get_memory(2**30, k) for k in range(4)] == [
+        2**30,
+        2**31,
+        2**32,
+        2**32,
+    ]
+    assert escalation.get_memory(None, 3) is None
+
+    with pytest.raises(ValueError):
+        ResourceEscalation(timeout_multiplier=0.5)
+
+
 ### ---- test order dependence for Python tasks ----
 
 
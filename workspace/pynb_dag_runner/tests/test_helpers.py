@@ -15,6 +15,8 @@ from pynb_dag_runner.helpers import (
     read_json,
     one,
     pairs,
+    topological_sort,
+    longest_path_weights,
 )
 
 # --- range helper functions ---
@@ -103,6 +105,71 @@ def test_one_raises_exception():
         assert one([1, 2])
 
 
+# --- graph helper functions ---
+
+
+def test_topological_sort():
+    assert topological_sort([], []) == []
+    assert topological_sort([1, 2, 3], []) == [1, 2, 3]
+    assert topological_sort([1, 2, 3], [(3, 1)]) == [2, 3, 1]
+    assert topological_sort([4, 3, 2, 1], [(1, 2), (2, 3), (3, 4)]) == [1, 2, 3, 4]
+
+    # diamond
+    assert topological_sort(
+        ["d", "c", "b", "a"], [("a", "b"), ("a", "c"), ("b", "d"), ("c", "d")]
+    ) == ["a", "b", "c", "d"]
+
+
+def test_topological_sort_random_dags():
+    for _ in range(100):
+        nodes = list(range(20))
+        edges = [
+            (a, b) for a in nodes for b in nodes if a < b and random.random() < 0.2
+        ]
+        random.shuffle(nodes)
+
+        result = topological_sort(nodes, edges)
+        assert sorted(result) == sorted(nodes)
+        for a, b in edges:
+            assert result.index(a) < result.index(b)
+
+
+@pytest.mark.parametrize(
+    "nodes, edges",
+    [
+        # cycles
+        ([1], [(1, 1)]),
+        ([1, 2, 3], [(1, 2), (2, 3), (3, 1)]),
+        # dangling edges
+        ([1, 2], [(1, 3)]),
+        ([1, 2], [(0, 1)]),
+        # duplicate nodes
+        ([1, 2, 1], []),
+    ],
+)
+def test_topological_sort_invalid_input(nodes, edges):
+    with pytest.raises(ValueError):
+        topological_sort(nodes, edges)
+
+
+def test_longest_path_weights():
+    #  a ---> b ---> d
+    #   \           ^
+    #    ---> c ---
+    edges = [("a", "b"), ("a", "c"), ("b", "d"), ("c", "d")]
+    weights = {"a": 1.0, "b": 10.0, "c": 100.0, "d": 1000.0}
+
+    assert longest_path_weights(["a", "b", "c", "d"], edges, weights) == {
+        "a": 1101.0,
+        "b": 1010.0,
+        "c": 1100.0,
+        "d": 1000.0,
+    }
+
+    # no edges
+    assert longest_path_weights(["a", "b"], [], weights) == {"a": 1.0, "b": 10.0}
+
+
 # --- function helper functions ---
 
 
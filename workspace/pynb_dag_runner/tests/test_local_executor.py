@@ -0,0 +1,122 @@
+import os, time
+from typing import List
+
+#
+import opentelemetry as otel
+import pytest
+
+#
+from pynb_dag_runner.helpers import one
+from pynb_dag_runner.core.dag_runner import (
+    RemoteTaskP,
+    TaskOutcome,
+    fan_in,
+    local_executor,
+    run_dag,
+    run_in_sequence,
+    start_and_await_tasks,
+    task_from_python_function,
+)
+from pynb_dag_runner.opentelemetry_helpers import Spans, SpanRecorder
+from pynb_dag_runner.opentelemetry_task_span_parser import extract_task_dependencies
+
+
+def test__local_executor__run_tasks_in_sequence_and_fan_in():
+    with SpanRecorder() as rec, local_executor(max_workers=2):
+        start_ts = time.monotonic()
+
+        #  task_a ---> task_b ---> task_d
+        #                            ^
+        #  task_c -------------------+
+        task_a, task_b, task_c = [
+            task_from_python_function(lambda _: 1, attributes={"task.name": name})
+            for name in ["a", "b", "c"]
+        ]
+
+        def f_d(outcomes: List[TaskOutcome]) -> int:
+            return len(outcomes)
+
+        task_d: RemoteTaskP = task_from_python_function(
+            f_d, attributes={"task.name": "d"}
+        )
+        run_in_sequence(task_a, task_b)
+        fan_in([task_b, task_c], task_d)
+
+        [outcome] = start_and_await_tasks([task_a, task_c], [task_d], timeout_s=10)
+        assert outcome.error is None
+        assert outcome.return_value == 2
+
+        # no Ray workers need to be started
+        assert time.monotonic() - start_ts < 5.0
+
+    def validate_spans(spans: Spans):
+        assert len(extract_task_dependencies(spans)) == 3
+
+        # same span structure as for tasks run on Ray
+        for name in ["a", "b", "c", "d"]:
+            task_span = one(spans.filter(["attributes", "task.name"], name))
+            assert task_span["status"]["status_code"] == "OK"
+            assert spans.contains_path(
+                task_span,
+                one(spans.bound_under(task_span).filter(["name"], "retry-wrapper")),
+                one(spans.bound_under(task_span).filter(["name"], "retry-call")),
+                one(spans.bound_under(task_span).filter(["name"], "timeout-guard")),
+                one(
+                    spans.bound_under(task_span).filter(
+                        ["name"], "call-python-function"
+                    )
+                ),
+            )
+
+    validate_spans(rec.spans)
+
+
+def test__local_executor__baggage_timeout_and_retries():
+    def f_baggage(_):
+        return otel.baggage.get_all()
+
+    def f_timeout(_):
+        time.sleep(1.0)
+
+    with local_executor():
+        task_baggage = task_from_python_function(f_baggage, timeout_s=12.3)
+        task_timeout = task_from_python_function(
+            f_timeout, timeout_s=0.1, max_nr_retries=2
+        )
+
+        with SpanRecorder() as rec:
+            [outcome_baggage, outcome_timeout] = run_dag(
+                [task_baggage, task_timeout], edges=[]
+            )
+
+    assert outcome_baggage.return_value == {
+        "task.timeout_s": "12.3",
+        "task.num_cpus": 1,
+        "run.retry_nr": "0",
+        "task.max_nr_retries": "1",
+    }
+    assert "Timeout error" in str(outcome_timeout.error)
+    assert len(rec.spans.filter(["name"], "retry-call")) == 1 + 2
+
+
+def test__local_executor__process_pool():
+    def f(_):
+        return os.getpid()
+
+    with local_executor(executor_type="process"):
+        task = task_from_python_function(f)
+        [outcome] = start_and_await_tasks([task], [task], timeout_s=60)
+
+    assert outcome.error is None
+    assert outcome.return_value != os.getpid()
+
+
+def test__local_executor__invalid_use():
+    with pytest.raises(ValueError):
+        with local_executor(executor_type="unknown-executor"):
+            pass
+
+    with local_executor():
+        with pytest.raises(Exception):
+            with local_executor():
+                pass
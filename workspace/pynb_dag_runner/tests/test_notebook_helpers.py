@@ -64,6 +64,24 @@ def test_can_convert_jupytext_notebook_to_ipynb_and_evaluate(tmp_path: Path):
     assert "variable_a=hello" in notebook_eval_ipynb.filepath.read_text()
 
 
+def test_evaluate_ipynb_notebook_with_environment_variables(tmp_path: Path):
+    notebook_py = JupytextNotebook(tmp_path / "notebook.py")
+    notebook_py.filepath.write_text(
+        """# %%
+import os
+print(f"OMP_NUM_THREADS={os.environ.get('OMP_NUM_THREADS')}")
+"""
+    )
+
+    output_ipynb = JupyterIpynbNotebook(tmp_path / "notebook_evaluated.ipynb")
+    omp_num_threads_before = os.environ.get("OMP_NUM_THREADS")
+
+    notebook_py.evaluate(output=output_ipynb, env={"OMP_NUM_THREADS": "3"})
+
+    assert "OMP_NUM_THREADS=3" in output_ipynb.filepath.read_text()
+    assert os.environ.get("OMP_NUM_THREADS") == omp_num_threads_before
+
+
 def test_random_ipynb_notebook_path(tmp_path: Path):
     notebook_ipynb = JupyterIpynbNotebook.temp(tmp_path)
 
@@ -1,5 +1,5 @@
-import time, random
-from typing import Any, Awaitable, Callable
+import asyncio, os, time, random
+from typing import Any, Awaitable, Callable, List
 
 #
 import opentelemetry as otel
@@ -11,6 +11,10 @@ from pynb_dag_runner.ray_helpers import (
     try_f_with_timeout_guard,
     retry_wrapper_ot,
     Future,
+    ResourceShape,
+    RetryBudget,
+    RetryPolicy,
+    TaskTimeoutError,
 )
 from pynb_dag_runner.opentelemetry_helpers import (
     SpanDict,
@@ -222,6 +226,99 @@ async def test_timeout_w_timeout(dummy_loop_parameter, task_timeout_s):
         assert result == Try(123, None)
 
 
+@pytest.mark.asyncio
+async def test_timeout_guard_reuses_pooled_actors_until_timeout():
+    def f(sleep_s: float) -> int:
+        time.sleep(sleep_s)
+        return os.getpid()
+
+    f_timeout: Callable[[float], Awaitable[Try[int]]] = try_f_with_timeout_guard(
+        f, timeout_s=5.0, num_cpus=2
+    )
+
+    with SpanRecorder() as rec:
+        pids = [(await f_timeout(0)).get() for _ in range(3)]
+
+        # actor killed by timeout is replaced with new actor
+        assert "timeout" in str((await f_timeout(10.0)).error)
+        pids += [(await f_timeout(0)).get()]
+
+    assert pids[0] == pids[1] == pids[2] != pids[3]
+
+    guard_spans = rec.spans.filter(["name"], "timeout-guard").sort_by_start_time()
+    assert [
+        read_key(span, ["attributes", "exec_actor_pool.hit"]) for span in guard_spans
+    ][1:] == [True, True, True, False]
+
+    for span in guard_spans:
+        assert read_key(span, ["attributes", "exec_actor_pool.lease_wait_s"]) >= 0
+
+
+@pytest.mark.asyncio
+async def test_timeout_guard_does_not_block_event_loop():
+    def f(_: Any) -> int:
+        time.sleep(2.0)
+        return 123
+
+    f_timeout: Callable[[Any], Awaitable[Try[int]]] = try_f_with_timeout_guard(
+        f, timeout_s=10.0, num_cpus=1
+    )
+
+    # other coroutines on the same event loop can run while the call is supervised
+    guard_task = asyncio.ensure_future(f_timeout("dummy"))
+    tick_ts: List[float] = [time.monotonic()]
+    while not guard_task.done():
+        await asyncio.sleep(0.1)
+        tick_ts.append(time.monotonic())
+
+    assert await guard_task == Try(123, None)
+    assert max(t2 - t1 for t1, t2 in zip(tick_ts, tick_ts[1:])) < 1.0
+
+
+def test_resource_shape_actor_options_and_attributes():
+    shape = ResourceShape.create(num_cpus=1, thread_limits={})
+    assert shape.actor_options() == {"num_cpus": 1}
+    assert shape.task_attributes() == {}
+
+    # by default, thread limits are set from num_cpus
+    shape = ResourceShape.create(num_cpus=3)
+    assert shape.actor_options()["runtime_env"]["env_vars"]["OMP_NUM_THREADS"] == "3"
+
+    shape = ResourceShape.create(
+        num_cpus=2,
+        memory=2**30,
+        resources={"GPU": 1, "accelerator": 0.5},
+        scheduling_strategy="SPREAD",
+        thread_limits={"OMP_NUM_THREADS": 4},
+    )
+    assert shape.actor_options() == {
+        "num_cpus": 2,
+        "memory": 2**30,
+        "resources": {"GPU": 1, "accelerator": 0.5},
+        "scheduling_strategy": "SPREAD",
+        "runtime_env": {"env_vars": {"OMP_NUM_THREADS": "4"}},
+    }
+    assert shape.task_attributes() == {
+        "task.memory": 2**30,
+        "task.resources.GPU": 1,
+        "task.resources.accelerator": 0.5,
+        "task.scheduling_strategy": "SPREAD",
+    }
+
+    # shapes are used as keys in ExecActorPool
+    assert shape == ResourceShape.create(
+        num_cpus=2,
+        memory=2**30,
+        resources={"accelerator": 0.5, "GPU": 1},
+        scheduling_strategy="SPREAD",
+        thread_limits={"OMP_NUM_THREADS": 4},
+    )
+
+    for invalid_args in [{"memory": 0}, {"scheduling_strategy": "PACK"}]:
+        with pytest.raises(ValueError):
+            ResourceShape.create(num_cpus=1, **invalid_args)  # type: ignore
+
+
 ### ---- tests for retry_wrapper ----
 
 
@@ -347,6 +444,102 @@ async def test_retry_wrapper_ot(args):
     validate_spans(await get_test_spans())
 
 
+def _retry_decisions(spans: Spans) -> List[Any]:
+    return [
+        (
+            read_key(span, ["attributes", "run.retry_decision"]),
+            span["attributes"].get("run.retry_reason"),
+        )
+        for span in spans.filter(["name"], "retry-call").sort_by_start_time()
+    ]
+
+
+@pytest.mark.asyncio
+async def test_retry_wrapper_with_exponential_backoff():
+    async def f(_):
+        return Try(value=None, error=ValueError("fail"))
+
+    policy = RetryPolicy(backoff_s=0.2, backoff_multiplier=2.0)
+    with SpanRecorder() as rec:
+        start_ts = time.monotonic()
+        result = await retry_wrapper_ot(f, max_nr_retries=3, retry_policy=policy)(1)
+        assert time.monotonic() - start_ts >= 0.2 + 0.4
+
+    assert result == Try(value=None, error=ValueError("fail"))
+    assert _retry_decisions(rec.spans) == [
+        ("retry", None),
+        ("retry", None),
+        ("stop", "max_nr_retries"),
+    ]
+
+    retry_call_spans = rec.spans.filter(["name"], "retry-call").sort_by_start_time()
+    assert [
+        span["attributes"].get("run.retry_delay_s") for span in retry_call_spans
+    ] == [0.2, 0.4, None]
+
+
+def test_retry_policy_delays_with_jitter():
+    policy = RetryPolicy(backoff_s=1.0, max_backoff_s=5.0, jitter=0.5)
+    for retry_nr, max_delay_s in [(1, 1.0), (2, 2.0), (3, 4.0), (4, 5.0), (10, 5.0)]:
+        for _ in range(100):
+            assert max_delay_s / 2 <= policy.get_delay_s(retry_nr) <= max_delay_s
+
+    for invalid_args in [{"jitter": 1.5}, {"backoff_s": -1.0}]:
+        with pytest.raises(ValueError):
+            RetryPolicy(**invalid_args)  # type: ignore
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "error, expected_nr_calls, expected_stop_reason",
+    [
+        (ConnectionError("network down"), 5, "max_nr_retries"),
+        (ValueError("invalid input"), 1, "error_not_retryable"),
+        (TaskTimeoutError(), 1, "timeout"),
+    ],
+)
+async def test_retry_wrapper_with_error_classification(
+    error, expected_nr_calls, expected_stop_reason
+):
+    nr_calls: List[int] = []
+
+    async def f(_):
+        nr_calls.append(1)
+        return Try(value=None, error=error)
+
+    policy = RetryPolicy(
+        retry_on=lambda e: isinstance(e, (ConnectionError, TaskTimeoutError)),
+        retry_on_timeout=False,
+    )
+    with SpanRecorder() as rec:
+        result = await retry_wrapper_ot(f, max_nr_retries=5, retry_policy=policy)(1)
+
+    assert result == Try(value=None, error=error)
+    assert len(nr_calls) == expected_nr_calls
+    assert _retry_decisions(rec.spans)[-1] == ("stop", expected_stop_reason)
+
+    retry_span: SpanDict = one(rec.spans.filter(["name"], "retry-wrapper"))
+    assert read_key(retry_span, ["status", "status_code"]) == "ERROR"
+
+
+@pytest.mark.asyncio
+async def test_retry_wrapper_with_shared_retry_budget():
+    nr_calls: List[int] = []
+
+    async def f(_):
+        nr_calls.append(1)
+        return Try(value=None, error=ValueError("fail"))
+
+    policy = RetryPolicy(budget=RetryBudget(max_nr_retries=3))
+    with SpanRecorder() as rec:
+        for _ in range(2):
+            await retry_wrapper_ot(f, max_nr_retries=10, retry_policy=policy)(1)
+
+    # first call for both wrappers, and 3 retries in total
+    assert len(nr_calls) == 2 + 3
+    assert _retry_decisions(rec.spans).count(("stop", "retry_budget_exhausted")) == 2
+
+
 ### ---- test Try implementation ----
 
 